@@ -0,0 +1,63 @@
+"""Shared setup for the benchmark scripts.
+
+Each script times the pylib in --root, this checkout by default. To get
+the numbers from before a change, check out the commit before it and
+point --root at it, for example:
+
+    git worktree add ../before <commit>^
+    python benchmarks/parse_memory.py --root ../before
+    python benchmarks/parse_memory.py
+"""
+
+import sys
+import time
+import argparse
+from os.path import abspath, dirname
+
+ROOT = dirname(dirname(abspath(__file__)))
+
+
+def parse_args(description, add_args=None):
+    """Get the arguments and put the --root's pylib first on the path."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        '--root', default=ROOT,
+        help="""Time the pylib in this checkout. The default is the one that
+            holds this script.""")
+    if add_args:
+        add_args(parser)
+    args = parser.parse_args()
+    sys.path.insert(0, abspath(args.root))
+    return args
+
+
+def best(func, runs=3):
+    """The fastest of several runs, in seconds."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def random_tree(rng, tips, taxa, support=False, root_children=1,
+                name='s{taxon}@t{tip}', digits=5):
+    """A random Newick tree with tips labeled "<taxon>@<tip>".
+
+    Subtrees are joined at random until root_children are left. The name
+    format gets the taxon and tip numbers, and branch lengths have the
+    given number of digits.
+    """
+    length = ':{{:.{}f}}'.format(digits)
+    nodes = [name.format(taxon=rng.randrange(taxa), tip=i)
+             + length.format(rng.random()) for i in range(tips)]
+    while len(nodes) > max(1, root_children):
+        one = nodes.pop(rng.randrange(len(nodes)))
+        two = nodes.pop(rng.randrange(len(nodes)))
+        label = str(rng.randrange(100)) if support else ''
+        nodes.append('({},{}){}'.format(one, two, label)
+                     + length.format(rng.random()))
+    if len(nodes) == 1:
+        return nodes[0].rsplit(':', 1)[0] + ';'
+    return '(' + ','.join(nodes) + ');'
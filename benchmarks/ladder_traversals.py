@@ -0,0 +1,66 @@
+"""Time the tree traversals on ladder (caterpillar) shaped trees.
+
+This is the benchmark for the explicit-stack traversals. Seconds:
+
+                    10k tips        100k tips
+                    before  after   after
+    iternodes       10.1*   0.02    0.43
+    leaves           9.7*   0.01    0.25
+    find_descendant  0.01*  0.01    0.05
+    node2size        0.01*  0.02    0.13
+    to_string        0.12*  0.02    0.25
+
+    * with --recursion-limit 100000. With the default limit every one
+      raises RecursionError.
+
+"before" is commit 417ff8f^ and "after" is 417ff8f.
+"""
+
+import sys
+import common
+
+
+def add_args(parser):
+    """Benchmark options."""
+    parser.add_argument(
+        '--tips', type=int, nargs='+', default=[10_000, 100_000],
+        help="""Tips in each ladder tree. The default is 10000 100000.""")
+    parser.add_argument(
+        '--recursion-limit', type=int,
+        help="""Raise Python's recursion limit so recursive traversals can
+            finish.""")
+
+
+def ladder(tips):
+    """A tree where every internal node has a tip as one of its children."""
+    parts = ['('] * (tips - 1) + ['s0@t0:1']
+    parts += [',s{}@t{}:1):1'.format(i % 7, i) for i in range(1, tips)]
+    return ''.join(parts) + ';'
+
+
+def main():
+    """Time each traversal on each tree."""
+    args = common.parse_args(__doc__.splitlines()[0], add_args)
+    from pylib import newick3, phylo3
+
+    if args.recursion_limit:
+        sys.setrecursionlimit(args.recursion_limit)
+
+    for tips in args.tips:
+        tree = newick3.parse(ladder(tips))
+        times = []
+        for name, func in [
+                ('iternodes', lambda: list(tree.iternodes())),
+                ('leaves', tree.leaves),
+                ('find_descendant', lambda: tree.find_descendant('missing')),
+                ('node2size', lambda: phylo3.node2size(tree)),
+                ('to_string', lambda: newick3.to_string(tree))]:
+            try:
+                times.append('{} {:.2f}s'.format(name, common.best(func, 1)))
+            except RecursionError:
+                times.append('{} RecursionError'.format(name))
+        print('{} tips: {}'.format(tips, ', '.join(times)))
+
+
+if __name__ == '__main__':
+    main()
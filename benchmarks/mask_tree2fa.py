@@ -0,0 +1,80 @@
+"""Time the mask and tree2fa steps on a set of random trees.
+
+This is the benchmark for porting mask, cut and tree2fa from Bio.Phylo
+to phylo3. With 100 trees of 300 tips, best of 3:
+
+                                before   after
+    mask                        50.9s    0.37s
+    ortholog_to_fasta            0.70s   0.25s
+    import the wrappers          0.32s   0.26s, no Bio.Phylo
+
+"before" is commit fa2db01^ and "after" is fa2db01. tree_to_fasta
+already read its trees with newick3 before that commit, so its time
+does not change. Each tree gets a small fasta file with just its own
+tips, so most of the time is spent on the trees.
+"""
+
+import re
+import sys
+import time
+import random
+from os.path import join
+from tempfile import TemporaryDirectory
+import common
+
+
+def add_args(parser):
+    """Benchmark options."""
+    parser.add_argument('--trees', type=int, default=100,
+                        help="""How many trees. The default is 100.""")
+    parser.add_argument('--tips', type=int, default=300,
+                        help="""Tips per tree. The default is 300.""")
+
+
+def write_inputs(temp_dir, args):
+    """Write the trees and a fasta file for each one with its tips."""
+    rng = random.Random(7)
+    genes = []
+    for i in range(args.trees):
+        text = common.random_tree(
+            rng, args.tips, 40, support=True, root_children=3)
+        tree = join(temp_dir, 'g{}.tt'.format(i))
+        with open(tree, 'w') as out_file:
+            out_file.write(text + '\n')
+        fasta = join(temp_dir, 'g{}.fasta'.format(i))
+        with open(fasta, 'w') as out_file:
+            for label in re.findall(r'[^(),:]+@[^(),:]+', text):
+                out_file.write('>{}\nACGTACGT\n'.format(label))
+        genes.append((fasta, tree))
+    return genes
+
+
+def main():
+    """Time both steps."""
+    args = common.parse_args(__doc__.splitlines()[0], add_args)
+
+    start = time.perf_counter()
+    from pylib.wrappers.mask_tips import mask_tips
+    from pylib.wrappers.tree_to_fasta import (
+        ortholog_to_fasta, tree_to_fasta)
+    imported = time.perf_counter() - start
+    bio = 'Bio.Phylo' in sys.modules
+
+    with TemporaryDirectory() as temp_dir:
+        genes = write_inputs(temp_dir, args)
+
+        print('import the wrappers: {:.2f}s, {} Bio.Phylo'.format(
+            imported, 'with' if bio else 'without'))
+        print('mask: {:.2f}s'.format(common.best(
+            lambda: [mask_tips(t, temp_dir, '.mm') for _, t in genes])))
+
+        masked = [(f, t[:-len('.tt')] + '.mm') for f, t in genes]
+        print('tree_to_fasta: {:.2f}s'.format(common.best(
+            lambda: [tree_to_fasta(f, t, temp_dir, '.fa')
+                     for f, t in masked])))
+        print('ortholog_to_fasta: {:.2f}s'.format(common.best(
+            lambda: [ortholog_to_fasta(f, t, temp_dir, 4, '.fa')
+                     for f, t in masked])))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Time splitting RT in-group clades into orthologs by duplication depth.
+
+This is the benchmark for tree_utils.get_ortho_from_rooted_inclade. The
+in-group clades have 200 species and each species tip is duplicated to
+the given depth. Best of 3:
+
+    depth   tips    before   after
+        1    400    0.021s   0.002s
+        2    800    0.042s   0.005s
+        3   1600    0.069s   0.009s
+        4   3200    0.097s   0.014s
+        5   6400    0.149s   0.031s
+        6  12800    0.268s   0.053s
+
+"before" is commit 1008720^ and "after" is 1008720. The numbers in that
+commit's message came from an earlier version of this script and differ
+a little.
+"""
+
+import random
+import common
+
+
+def add_args(parser):
+    """Benchmark options."""
+    parser.add_argument('--species', type=int, default=200,
+                        help="""Species in each clade. The default is
+                            200.""")
+    parser.add_argument('--depths', type=int, nargs='+',
+                        default=[1, 2, 3, 4, 5, 6],
+                        help="""Duplication depths to time. The default is
+                            1 through 6.""")
+
+
+def inclade(species, depth, rng):
+    """A random species tree where each tip is a duplicated gene clade."""
+    tip = 0
+    nodes = []
+    for name in range(species):
+        copies = []
+        for _ in range(2 ** depth):
+            copies.append('S{}@g{}:0.1'.format(name, tip))
+            tip += 1
+        while len(copies) > 1:  # duplicated to the full depth
+            copies = ['({},{}):0.1'.format(copies[i], copies[i + 1])
+                      for i in range(0, len(copies), 2)]
+        nodes.append(copies[0])
+    while len(nodes) > 1:
+        one = nodes.pop(rng.randrange(len(nodes)))
+        two = nodes.pop(rng.randrange(len(nodes)))
+        nodes.append('({},{}):{:.3f}'.format(one, two, rng.random()))
+    return nodes[0].rsplit(':', 1)[0] + ';'
+
+
+def main():
+    """Time each depth on a fresh tree."""
+    args = common.parse_args(__doc__.splitlines()[0], add_args)
+    from pylib import newick3
+    from pylib.tree_utils import get_ortho_from_rooted_inclade
+
+    print('depth   tips   time')
+    for depth in args.depths:
+        text = inclade(args.species, depth, random.Random(depth))
+        times = []
+        for _ in range(3):
+            tree = newick3.parse(text)
+            times.append(common.best(
+                lambda: get_ortho_from_rooted_inclade(tree), 1))
+        print('{:5d} {:6d}  {:.3f}s'.format(
+            depth, args.species * 2 ** depth, min(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Time the Newick parser on one big tree and on many small ones.
+
+This is the benchmark for the regex parser that replaced the shlex
+tokenizer. The tips are named like the pipeline's homolog trees,
+"<taxonID>@<seqID>" with TransDecoder sequence IDs, and branch lengths
+have 8 digits. Best of 8 runs of the script, alternating with the old
+parser, seconds:
+
+                               before   after   speedup
+    one 50,000-tip tree         2.58     0.24    11x
+    5,000 60-tip trees         13.35     1.31    10x
+
+"before" is commit f8ef428^. The old tokenizer's time grows with the
+length of the text and the new parser's mostly with the number of nodes,
+so trees with short names like "s4@t26" gain less, about 6 to 8x. Most
+of the time left is spent creating and collecting the phylo3.Node
+objects, which any parser has to do.
+"""
+
+import random
+import common
+
+# Tip names like the TransDecoder output that the homolog trees are built
+# from: "<taxonID>@<seqID>"
+NAME = 'T{taxon:03d}@TRINITY_DN{tip}_c0_g1_i1.p1'
+
+
+def add_args(parser):
+    """Benchmark options."""
+    parser.add_argument('--tips', type=int, default=50_000,
+                        help="""Tips in the big tree. The default is
+                            50,000.""")
+    parser.add_argument('--trees', type=int, default=5_000,
+                        help="""How many small trees. The default is
+                            5,000.""")
+
+
+def main():
+    """Time both workloads."""
+    args = common.parse_args(__doc__.splitlines()[0], add_args)
+    from pylib import newick3
+
+    rng = random.Random(0)
+    big = common.random_tree(rng, args.tips, 300, name=NAME, digits=8)
+    small = [common.random_tree(rng, 60, 30, support=True, name=NAME,
+                                digits=8)
+             for _ in range(args.trees)]
+
+    print('one {}-tip tree: {:.2f}s'.format(
+        args.tips, common.best(lambda: newick3.parse(big))))
+    print('{} 60-tip trees: {:.2f}s'.format(
+        args.trees,
+        common.best(lambda: parse_each(newick3, small))))
+
+
+def parse_each(newick3, trees):
+    """Parse the trees one at a time without keeping them, like a step."""
+    for tree in trees:
+        newick3.parse(tree)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,24 +5,29 @@
 import re
 import sys
 import os
-from os.path import abspath, expanduser, isfile
 import logging
 from glob import glob
 import argparse
 from pylib import util
 from pylib import bio
+from pylib.failures import FAILURES
+from pylib.manifest import MANIFEST
 from pylib.steps.check import check
 from pylib.steps.fa2tree import fa2tree
 from pylib.steps.shrink import shrink
 from pylib.steps.mask import mask
 from pylib.steps.cut import cut
 from pylib.steps.tree2fa import tree2fa
-from pylib.steps.prune import prune_paralogs
-from pylib.steps.orth2fa import orthologs_to_fasta
+from pylib.steps.prune import prune
+from pylib.steps.orth2fa import orth2fa
+from pylib.steps.run import run
+from pylib.steps.worker import enqueue, worker
+from pylib.work_queue import LEASE, QUEUE
 
 
 STEP = 0
 INPUT_ATTRS = set()
+PRUNERS = ['1to1', 'mi', 'mo', 'rt']
 
 
 def construct():
@@ -34,10 +39,14 @@ def construct():
     args = parse_args()
 
     step_name = args.func.__name__  # Get entered step via its function name
-    if step_name == 'prune':
+    if step_name in ('prune', 'run'):
         check_args(args)
         parse_out_groups(args)
 
+    if getattr(args, 'enqueue', False):
+        enqueue(args)
+        return
+
     args.func(args)
 
 
@@ -71,6 +80,8 @@ def parse_args():
     tree2fa_step(subparsers)
     prune_step(subparsers)
     orth2fa_step(subparsers)
+    run_step(subparsers)
+    worker_step(subparsers)
 
     args = parser.parse_args()
 
@@ -87,9 +98,11 @@ def expand_files(args):
         if not hasattr(args, attr):
             continue
 
+        names = getattr(args, attr) or [getattr(args, 'default_' + attr)]
+
         arg_files = []
         try:
-            for name in getattr(args, attr):
+            for name in names:
                 files = glob(name)
                 if not files:
                     raise ValueError(name)
@@ -129,23 +142,19 @@ def fasta2tree_step(subparsers):
     io_args(fa2tree_parser, '*.fasta', '.tre')
     seq_type_arg(fa2tree_parser)
     cpus_arg(fa2tree_parser)
+    jobs_arg(fa2tree_parser)
     fa2tree_parser.add_argument(
-        '--bootstrap', action='store_true',
-        help="""Turn on rapid bootstrapping.""")
-    fa2tree_parser.add_argument(
-        '--anysymbol', action='store_true',
-        help="""A mafft only option to handle when there are "U"s in aa
-            sequences.""")
-    fa2tree_parser.add_argument(
-        '--min-occupancy', type=float, default=0.3,
-        help="""""")
-    fa2tree_parser.add_argument(
-        '--min-seq-len', type=int, default=10,
-        help="""""")
-    fa2tree_parser.add_argument(
-        '--seed', type=int, default=12345,
-        help="""A random number seed. This allows you to reproduce your
-            results and helps with debugging the program.""")
+        '--engine', choices=['processes', 'asyncio'], default='processes',
+        help="""How to run the jobs. "processes" runs each job in its own
+            process, see --jobs. "asyncio" runs the wrapped programs for all
+            of the jobs from this one process, at most --jobs programs at a
+            time with --cpus / --jobs CPUs each. This is lighter than the
+            process pool since the Python side is mostly waiting on the
+            programs. The default is "processes".""")
+    fa2tree_args(fa2tree_parser)
+    failure_args(fa2tree_parser)
+    force_arg(fa2tree_parser)
+    enqueue_arg(fa2tree_parser)
     fa2tree_parser.set_defaults(func=fa2tree)
 
 
@@ -154,10 +163,9 @@ def shrink_step(subparsers):
     shrink_parser = subparsers.add_parser(
         'shrink', help=helper("""Trim spurious tips with TreeShrink."""))
     io_args(shrink_parser, '*.tre', '.tt')
-    shrink_parser.add_argument(
-        '--quantiles', type=float, default=0.05,
-        help="""A TreeShrink only option for tree trimming quantiles. The
-            default is 0.05.""")
+    quantiles_arg(shrink_parser)
+    force_arg(shrink_parser)
+    enqueue_arg(shrink_parser)
     shrink_parser.set_defaults(func=shrink)
 
 
@@ -166,6 +174,9 @@ def mask_step(subparsers):
     mask_parser = subparsers.add_parser(
         'mask', help=helper("""Mask both monophyletic tree tips."""))
     io_args(mask_parser, '*.tt', '.mm')
+    binary_trees_arg(mask_parser)
+    force_arg(mask_parser)
+    enqueue_arg(mask_parser)
     mask_parser.set_defaults(func=mask)
 
 
@@ -178,10 +189,8 @@ def cut_step(subparsers):
         '--branch-cutoff', type=float, required=True,
         help="""Internal branch length cutoff. Cut branches longer than this
             value.""")
-    cut_parser.add_argument(
-        '--min-taxa', type=int, required=True,
-        help="""Minimum number of taxa. Make sure that trees have at least
-            this number of taxa.""")
+    min_taxa_arg(cut_parser)
+    force_arg(cut_parser)
     cut_parser.set_defaults(func=cut)
 
 
@@ -191,21 +200,87 @@ def tree2fa_step(subparsers):
         'tree2fa', help=helper(""""""))
     input_files(tree2fa_parser, '*.t', long='--tree-files', short='-t')
     input_files(tree2fa_parser, '*.m', long='--mask-files', short='-m')
+    output_args(tree2fa_parser, '.fa')
+    force_arg(tree2fa_parser)
     tree2fa_parser.set_defaults(func=tree2fa)
 
 
 def prune_step(subparsers):
     """Add prune step."""
     prune_parser = subparsers.add_parser(
-        'prune', help=helper(""""""))
-    prune_parser.set_defaults(func=prune_paralogs)
+        'prune', help=helper("""Prune paralogs from homolog trees."""))
+    io_args(prune_parser, '*.mm', None)
+    min_taxa_arg(prune_parser)
+    prune_args(prune_parser, required=True)
+    force_arg(prune_parser)
+    enqueue_arg(prune_parser)
+    prune_parser.set_defaults(func=prune)
 
 
 def orth2fa_step(subparsers):
     """Add orth2fa step."""
     orth2fa_parser = subparsers.add_parser(
-        'orth2fa', help=helper(""""""))
-    orth2fa_parser.set_defaults(func=orthologs_to_fasta)
+        'orth2fa', help=helper("""Write the sequences in ortholog trees to
+            fasta files."""))
+    input_files(orth2fa_parser, '*ortho*.tre', long='--tree-files',
+                short='-t')
+    input_files(orth2fa_parser, '*.fasta', long='--fasta-files', short='-f')
+    output_args(orth2fa_parser, '.fa')
+    min_taxa_arg(orth2fa_parser)
+    force_arg(orth2fa_parser)
+    orth2fa_parser.set_defaults(func=orth2fa)
+
+
+def run_step(subparsers):
+    """Add run step."""
+    run_parser = subparsers.add_parser(
+        'run', help=util.shorten("""Run all of the steps on each fasta file:
+            check, fa2tree, shrink, mask, tree2fa, and if --prune is given,
+            prune and orth2fa. Each gene moves on to its next step as soon as
+            it is ready instead of waiting for every other gene to finish
+            the current step. Use --jobs to run several genes at once. The
+            cut step is not run: it is optional and its subtrees need new
+            alignments and trees, so run cut, tree2fa, and fa2tree on their
+            own when you need it."""))
+    input_files(run_parser, '*.fasta')
+    output_args(run_parser)
+    seq_type_arg(run_parser)
+    cpus_arg(run_parser)
+    jobs_arg(run_parser)
+    fa2tree_args(run_parser)
+    failure_args(run_parser)
+    quantiles_arg(run_parser)
+    run_parser.add_argument(
+        '--min-taxa', type=int, default=4,
+        help="""Minimum number of taxa for the prune and orth2fa steps. The
+            default is 4.""")
+    prune_args(run_parser, required=False)
+    binary_trees_arg(run_parser)
+    force_arg(run_parser)
+    enqueue_arg(run_parser)
+    run_parser.set_defaults(func=run)
+
+
+def worker_step(subparsers):
+    """Add worker step."""
+    worker_parser = subparsers.add_parser(
+        'worker', help=util.shorten("""Run genes from a work queue. First
+            run a step with the --enqueue option, this puts its input files
+            into a "{}" file in its output directory. Then start any number
+            of workers with the same --output-dir on any machine that can see
+            that directory. Each worker takes a gene, runs the step on it,
+            and marks it done.""".format(QUEUE)))
+    output_args(worker_parser)
+    worker_parser.add_argument(
+        '--cpus', type=int, default=1,
+        help="""Number of CPU processors this worker gives to the wrapped
+            programs. The default is 1.""")
+    worker_parser.add_argument(
+        '--lease', type=int, default=LEASE, metavar='SECONDS',
+        help="""A worker renews its hold on a gene while it works on it. If
+            the worker dies then the gene is given to another worker after
+            this many seconds. The default is {}.""".format(LEASE))
+    worker_parser.set_defaults(func=worker)
 
 
 def helper(msg):
@@ -226,9 +301,10 @@ def input_files(parser, input_filter, long='--input-files', short='-i'):
     global INPUT_ATTRS
     arg_name = long[2:].replace('-', '_')
     INPUT_ATTRS.add(arg_name)
+    parser.set_defaults(**{'default_' + arg_name: input_filter})
 
     parser.add_argument(
-        short, long, default=input_filter, metavar='FILTER', action='append',
+        short, long, metavar='FILTER', action='append',
         help="""Use this to filter files in an input directory. For example
             'my_project/*filtered{1}' will select all files ending with "{1}"
             in the local directory "my_project" and with the word "filtered"
@@ -262,16 +338,129 @@ def cpus_arg(parser):
     """How many CPUS to use."""
     parser.add_argument(
         '--cpus', type=int, default=1,
-        help="""Number of CPU processors to use. This is passed to wrapped
-            programs that use this option like: mafft or pasta.
+        help="""Number of CPU processors to use. This is the total budget
+            that is split between concurrent jobs (see --jobs) and the
+            wrapped programs that use this option like: mafft or pasta.
             The default will use 1 out of {} CPUs.
             """.format(os.cpu_count()))
 
 
-def other_args(parser):
-    """Placeholder."""
+def jobs_arg(parser):
+    """How many input files to process at once."""
+    parser.add_argument(
+        '--jobs', type=int, default=1,
+        help="""Number of input files to process at the same time. The files
+            with the most and longest sequences are started first and get a
+            bigger share of the --cpus for their wrapped programs. The
+            smaller files are packed into the CPUs that are left over. For
+            example "--cpus 64 --jobs 16" runs up to 16 files at once. There
+            are never more jobs than --cpus, so raise --cpus too: with the
+            default of 1 CPU the files are processed one at a time. The
+            default is 1.""")
+
+
+def enqueue_arg(parser):
+    """Put the input files into a work queue instead of running them."""
+    parser.add_argument(
+        '--enqueue', action='store_true',
+        help="""Do not run the step now. Put the input files into a work
+            queue in the output directory for "worker" processes to
+            run.""")
+
+
+def binary_trees_arg(parser):
+    """Write the masked trees in the binary tree format."""
     parser.add_argument(
-        '-p', '--prune', choices=['1to1', 'mi', 'mo', 'rt'], required=True,
+        '--binary-trees', action='store_true',
+        help="""Write the masked trees (the .mm files) in a compact binary
+            format that the later steps read much faster than Newick. The
+            final outputs are still Newick.""")
+
+
+def force_arg(parser):
+    """Redo work that is already done."""
+    parser.add_argument(
+        '--force', action='store_true',
+        help="""Redo all of the work. Normally, input files that were already
+            processed with the same options are skipped if their output files
+            still exist. This uses a "{}" file in the output
+            directory.""".format(MANIFEST))
+
+
+def fa2tree_args(parser):
+    """Options for building trees."""
+    parser.add_argument(
+        '--cache-dir', metavar='PATH',
+        help="""Keep the output of mafft, pxclsq, raxml, and fasttree in this
+            directory. When one of these programs is run again with the same
+            input and options its output is copied from here instead. The
+            default is to not use a cache.""")
+    parser.add_argument(
+        '--cache-size', type=float, default=10, metavar='GB',
+        help="""The maximum size of the --cache-dir in gigabytes. The least
+            recently used outputs are removed when it gets bigger than this.
+            The default is 10.""")
+    parser.add_argument(
+        '--max-mem', type=float, metavar='GB',
+        help="""Only start another RAxML or PASTA job when the estimated memory
+            of all the running jobs fits in this many gigabytes. The estimates
+            come from the alignment sizes and are corrected with the memory
+            used by finished jobs. A job is always started if nothing else is
+            running. The default is no limit.""")
+    parser.add_argument(
+        '--bootstrap', action='store_true',
+        help="""Turn on rapid bootstrapping.""")
+    parser.add_argument(
+        '--anysymbol', action='store_true',
+        help="""A mafft only option to handle when there are "U"s in aa
+            sequences.""")
+    parser.add_argument(
+        '--min-occupancy', type=float, default=0.3,
+        help="""""")
+    parser.add_argument(
+        '--min-seq-len', type=int, default=10,
+        help="""""")
+    parser.add_argument(
+        '--seed', type=int, default=12345,
+        help="""A random number seed. This allows you to reproduce your
+            results and helps with debugging the program.""")
+
+
+def failure_args(parser):
+    """What to do when a gene fails."""
+    parser.add_argument(
+        '--timeout', type=float, metavar='SECONDS',
+        help="""Stop working on a gene if it takes longer than this. The
+            default is no limit.""")
+    parser.add_argument(
+        '--retries', type=int, default=2,
+        help="""Retry genes that failed this many times after all of the other
+            genes are done. The first retry adds --anysymbol, later ones also
+            use fasttree in place of raxml. Genes that still fail are listed
+            in "{}" in the output directory. The default is 2.""".format(
+                FAILURES))
+
+
+def quantiles_arg(parser):
+    """TreeShrink quantiles."""
+    parser.add_argument(
+        '--quantiles', type=float, default=0.05,
+        help="""A TreeShrink only option for tree trimming quantiles. The
+            default is 0.05.""")
+
+
+def min_taxa_arg(parser):
+    """Minimum number of taxa."""
+    parser.add_argument(
+        '--min-taxa', type=int, required=True,
+        help="""Minimum number of taxa. Make sure that trees have at least
+            this number of taxa.""")
+
+
+def prune_args(parser, required=True):
+    """Options for pruning paralogs."""
+    parser.add_argument(
+        '-p', '--prune', choices=PRUNERS, required=required,
         help="""How will you prune the input trees.
               "1to1" = Only look at homologs that are strictly one-to-one.
                        No cutting is carried out.
@@ -292,16 +481,25 @@ def other_args(parser):
         '--taxon-code-file', metavar='CODE-FILE',
         help="""Path to the taxon code file.""")
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--relative-tip-cutoff', type=float,
+        help="""Used when --prune=mi. Trim tips that are longer than this
+            and more than 10 times longer than their sister.""")
 
-    args.output_dir = abspath(expanduser(args.output_dir))
+    parser.add_argument(
+        '--absolute-tip-cutoff', type=float,
+        help="""Used when --prune=mi. Trim tips that are longer than
+            this.""")
 
-    return args
+    parser.add_argument(
+        '--precision', type=int, metavar='DIGITS',
+        help="""Write the branch lengths of the pruned trees with this many
+            significant digits. The default is to write them in full.""")
 
 
 def check_args(args):
     """Check arguments are consistent."""
-    if args.prune == 'mo' and not args.in_groups:
+    if args.prune == 'mo' and not args.out_groups:
         sys.exit(util.shorten("""You must specify out-groups
             when --prune=mo."""))
 
@@ -309,6 +507,11 @@ def check_args(args):
         sys.exit(util.shorten("""You must specify a taxon code file
             when --prune=rt."""))
 
+    if args.prune == 'mi' and (args.relative_tip_cutoff is None
+                               or args.absolute_tip_cutoff is None):
+        sys.exit(util.shorten("""You must specify a relative and an absolute
+            tip cutoff when --prune=mi."""))
+
 
 def parse_out_groups(args):
     """Check all sequences are a member of an in- or out-group."""
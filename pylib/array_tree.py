@@ -0,0 +1,181 @@
+"""Trees stored as NumPy arrays for fast whole-tree calculations.
+
+Nodes are numbered in preorder so a node always comes after its parent
+and each subtree is a contiguous block of node numbers. Calculations
+that walk the tree are done one depth level at a time with NumPy, so the
+number of interpreted steps is the height of the tree, not its size.
+"""
+
+import numpy as np
+from pylib.phylo3 import Node
+from pylib.tree_utils import get_name
+
+NONE = -1  # No parent, child, sibling, or taxon
+
+
+class ArrayTree:
+    """A tree as arrays of node properties, indexed by node number.
+
+    parent:       the parent of each node, NONE for the root
+    first_child:  the first child of each node, NONE for tips
+    next_sibling: the next child of the node's parent, NONE for the last
+    length:       the branch length leading to each node, NaN for None
+    lengths:      the branch lengths as given, None and ints kept (a list)
+    istip:        True for tips
+    taxon:        the taxon code for tips, NONE for internal nodes
+    taxa:         the taxon name for each taxon code
+    labels:       the node labels (a list, not an array)
+    preorder:     the nodes in preorder
+    postorder:    the nodes in postorder
+    depth:        the number of edges from the root to each node
+    end:          one past the last node of each node's subtree
+    """
+
+    def __init__(self, parent, length, istip, labels):
+        self.parent = np.asarray(parent, dtype=np.int32)
+        self.lengths = list(length)
+        self.length = np.array(self.lengths, dtype=np.float64)
+        self.istip = np.asarray(istip, dtype=bool)
+        self.labels = list(labels)
+        self.size = len(self.parent)
+
+        assert self.size and self.parent[0] == NONE, 'node 0 must be the root'
+        assert np.all(self.parent[1:] < np.arange(1, self.size)), \
+            'nodes must be in preorder'
+
+        self._taxa()
+        self._links()
+        self._levels()
+        self._orders()
+
+    @classmethod
+    def from_node(cls, root):
+        """Convert a phylo3 tree."""
+        parent, length, istip, labels = [], [], [], []
+        stack = [(root, NONE)]
+        while stack:
+            node, parent_idx = stack.pop()
+            parent.append(parent_idx)
+            length.append(node.length)
+            istip.append(node.istip)
+            labels.append(node.label)
+            idx = len(parent) - 1
+            stack += [(c, idx) for c in reversed(node.children)]
+        return cls(parent, length, istip, labels)
+
+    def to_node(self):
+        """Convert back to a phylo3 tree and return its root."""
+        nodes = []
+        for idx in range(self.size):
+            node = Node()
+            node.label = self.labels[idx]
+            node.length = self.lengths[idx]
+            node.istip = bool(self.istip[idx])
+            nodes.append(node)
+            if self.parent[idx] != NONE:
+                nodes[self.parent[idx]].add_child(node)
+        nodes[0].isroot = True
+        return nodes[0]
+
+    def _taxa(self):
+        """Give each taxon a code and find the code for each tip."""
+        codes = {}
+        self.taxon = np.full(self.size, NONE, dtype=np.int32)
+        for idx in np.flatnonzero(self.istip):
+            name = get_name(self.labels[idx])
+            self.taxon[idx] = codes.setdefault(name, len(codes))
+        self.taxa = list(codes)
+
+    def _links(self):
+        """Build the first child and next sibling links."""
+        self.first_child = np.full(self.size, NONE, dtype=np.int32)
+        self.next_sibling = np.full(self.size, NONE, dtype=np.int32)
+        nodes = np.arange(1, self.size)
+        parents = self.parent[1:]
+
+        # In preorder a node's first child comes right after it
+        has_child = parents == nodes - 1
+        self.first_child[parents[has_child]] = nodes[has_child]
+
+        # Siblings are in order, a node is followed by the next one
+        order = np.lexsort((nodes, parents))
+        same = parents[order][1:] == parents[order][:-1]
+        self.next_sibling[nodes[order][:-1][same]] = nodes[order][1:][same]
+
+    def _levels(self):
+        """Group the nodes by their depth.
+
+        The depths are found by pointer jumping. Each node points to an
+        ancestor and knows how many edges up it is. Every pass adds the
+        ancestor's count and points to the ancestor's ancestor, so the
+        number of passes is the log of the height of the tree.
+        """
+        self.depth = (self.parent != NONE).astype(np.int32)
+        up = self.parent.copy()
+        while True:
+            moving = np.flatnonzero(up != NONE)
+            if not moving.size:
+                break
+            ancestors = up[moving]
+            self.depth[moving] += self.depth[ancestors]
+            up[moving] = up[ancestors]
+        order = np.argsort(self.depth, kind='stable')
+        bounds = np.cumsum(np.bincount(self.depth))[:-1]
+        self.levels = np.split(order, bounds)
+
+    def _orders(self):
+        """Find the end of each subtree and the pre- and postorders."""
+        self.preorder = np.arange(self.size, dtype=np.int32)
+        counts = self.sum_up(np.ones(self.size, dtype=np.int32))
+        self.end = self.preorder + counts
+
+        # In postorder a node comes after all of the nodes in its subtree.
+        # Sorting by the subtree end, deepest first, gives that order.
+        self.postorder = np.lexsort((-self.depth, self.end)).astype(np.int32)
+
+    def sum_up(self, values):
+        """Add each node's value to all of its ancestors."""
+        values = values.copy()
+        for level in reversed(self.levels[1:]):
+            np.add.at(values, self.parent[level], values[level])
+        return values
+
+    def clade_sizes(self):
+        """The number of tips in each node's subtree."""
+        tips = np.concatenate(([0], np.cumsum(self.istip)))
+        return tips[self.end] - tips[self.preorder]
+
+    def root_distances(self):
+        """The branch length distance from the root to each node."""
+        dist = np.zeros(self.size)
+        for level in self.levels[1:]:
+            dist[level] = dist[self.parent[level]] + self.length[level]
+        return dist
+
+    def lca(self, nodes1, nodes2):
+        """The last common ancestor of each pair of nodes."""
+        nodes1 = np.array(nodes1, dtype=np.int32)
+        nodes2 = np.array(nodes2, dtype=np.int32)
+        while True:
+            differ = nodes1 != nodes2
+            if not differ.any():
+                return nodes1
+            up1 = differ & (self.depth[nodes1] >= self.depth[nodes2])
+            up2 = differ & (self.depth[nodes2] >= self.depth[nodes1])
+            nodes1[up1] = self.parent[nodes1[up1]]
+            nodes2[up2] = self.parent[nodes2[up2]]
+
+    def taxon_counts(self):
+        """The number of different taxa in each node's subtree.
+
+        Take the tips of each taxon in preorder. A subtree with k of them
+        holds k - 1 neighboring pairs and their last common ancestors are
+        in the subtree too. So the count is the number of tips minus the
+        number of those ancestors in the subtree.
+        """
+        tips = np.flatnonzero(self.istip)
+        tips = tips[np.argsort(self.taxon[tips], kind='stable')]
+        same = self.taxon[tips][1:] == self.taxon[tips][:-1]
+        ancestors = self.lca(tips[:-1][same], tips[1:][same])
+        repeats = np.bincount(ancestors, minlength=self.size)
+        return self.clade_sizes() - self.sum_up(repeats)
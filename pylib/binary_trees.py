@@ -0,0 +1,165 @@
+"""A compact binary file format for trees passed between steps.
+
+Newick has to be tokenized and its numbers converted every time a step
+reads it. This format stores each tree as arrays that are read in bulk:
+
+    header:  node count, label count, label table size in bytes
+    parent:  int32 per node, the nodes are in preorder and the root is -1
+    length:  float64 per node, the branch lengths
+    flags:   uint8 per node, see TIP, NO_LENGTH, and INT_LENGTH
+    label:   int32 per node, an index into the label table or -1
+    table:   the labels in UTF-8, separated by NUL characters. Each
+             distinct label is stored once
+
+A file is MAGIC followed by any number of trees. Everything is little
+endian. Final outputs are still written as Newick.
+"""
+
+import sys
+import struct
+from array import array
+from pylib.phylo3 import Node, gc_paused
+
+MAGIC = b'PDCTREE1'
+HEADER = struct.Struct('<III')
+SEPARATOR = '\0'
+
+TIP = 1
+NO_LENGTH = 2  # The length is None
+INT_LENGTH = 4  # The length is an int, like the default 0
+
+
+def is_binary(buffer):
+    """Does the file contents start with the magic bytes?"""
+    return buffer[:len(MAGIC)] == MAGIC
+
+
+def is_binary_file(path):
+    """Is the file in the binary format?"""
+    with open(path, 'rb') as in_file:
+        return is_binary(in_file.read(len(MAGIC)))
+
+
+def encode(root):
+    """Convert a phylo3 tree to its arrays."""
+    parent = array('i')
+    length = array('d')
+    flags = array('B')
+    label = array('i')
+    labels = {}
+
+    stack = [(root, -1)]
+    while stack:
+        node, parent_idx = stack.pop()
+        idx = len(parent)
+        parent.append(parent_idx)
+
+        flag = TIP if node.istip else 0
+        if node.length is None:
+            flag |= NO_LENGTH
+            length.append(0.0)
+        else:
+            if isinstance(node.length, int):
+                flag |= INT_LENGTH
+            length.append(node.length)
+        flags.append(flag)
+
+        if node.label is None:
+            label.append(-1)
+        else:
+            if node.label not in labels and SEPARATOR in node.label:
+                raise ValueError(
+                    'labels may not hold NUL characters: {!r}'.format(
+                        node.label))
+            label.append(labels.setdefault(node.label, len(labels)))
+
+        stack += [(c, idx) for c in reversed(node.children)]
+
+    return parent, length, flags, label, list(labels)
+
+
+def dump_tree(root, out_file):
+    """Write one tree to a binary file opened for writing."""
+    parent, length, flags, label, labels = encode(root)
+
+    table = SEPARATOR.join(labels).encode('utf-8')
+
+    out_file.write(HEADER.pack(len(parent), len(labels), len(table)))
+    for values in (parent, length, flags, label):
+        if sys.byteorder == 'big':
+            values.byteswap()
+        out_file.write(values.tobytes())
+    out_file.write(table)
+
+
+def save_trees(trees, path):
+    """Write trees to a binary tree file."""
+    with open(path, 'wb') as out_file:
+        out_file.write(MAGIC)
+        for root in trees:
+            dump_tree(root, out_file)
+
+
+def read_array(typecode, buffer, pos, count):
+    """Read count values from the buffer, return them and the new pos."""
+    values = array(typecode)
+    end = pos + count * values.itemsize
+    values.frombytes(buffer[pos:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
+
+
+def load_tree(buffer, pos):
+    """Read the tree at pos. Return its root and the position after it."""
+    nodes, label_count, table_size = HEADER.unpack_from(buffer, pos)
+    pos += HEADER.size
+
+    parent, pos = read_array('i', buffer, pos, nodes)
+    length, pos = read_array('d', buffer, pos, nodes)
+    flags, pos = read_array('B', buffer, pos, nodes)
+    label, pos = read_array('i', buffer, pos, nodes)
+
+    table = buffer[pos:pos + table_size]
+    pos += table_size
+    labels = []
+    if label_count:
+        labels = bytes(table).decode('utf-8').split(SEPARATOR)
+    labels.append(None)  # For the -1 index
+
+    return build(parent, length, flags, label, labels), pos
+
+
+def build(parent, length, flags, label, labels):
+    """Build the phylo3 tree from its arrays and return the root."""
+    built = []
+    with gc_paused():
+        for parent_idx, value, flag, label_idx in zip(
+                parent.tolist(), length.tolist(), flags.tolist(),
+                label.tolist()):
+            node = Node()
+            node.label = labels[label_idx]
+            if flag & TIP:
+                node.istip = True
+            if flag & NO_LENGTH:
+                node.length = None
+            elif flag & INT_LENGTH:
+                node.length = int(value)
+            else:
+                node.length = value
+            if parent_idx >= 0:
+                up = built[parent_idx]
+                up.children.append(node)
+                node.parent = up
+            built.append(node)
+    return built[0] if built else None
+
+
+def iter_trees(buffer):
+    """Read the trees from the contents of a binary file one at a time."""
+    if not is_binary(buffer):
+        raise ValueError('not a binary tree file')
+    pos = len(MAGIC)
+    while pos < len(buffer):
+        root, pos = load_tree(buffer, pos)
+        yield root
@@ -1,6 +1,7 @@
 """Utilities for working with sequences."""
 
 import re
+from os.path import abspath
 from functools import reduce
 from Bio.SeqIO.FastaIO import SimpleFastaParser
 from . import util
@@ -64,13 +65,12 @@ def adjust_aa_seq(seq):
 
 def adjust_aa_seqs(fasta_file, output_dir):
     """Fix up amino acid sequences."""
-    file_name = util.file_name(fasta_file, '_aa.fasta')
+    file_name = util.file_name(fasta_file, '_aa.fasta', abspath(output_dir))
 
-    with util.cd(output_dir):
-        with open(fasta_file) as in_file, open(file_name, 'w') as out_file:
-            for header, seq in SimpleFastaParser(in_file):
-                seq = adjust_aa_seq(seq)
-                write_fasta_record(out_file, header, seq)
+    with open(fasta_file) as in_file, open(file_name, 'w') as out_file:
+        for header, seq in SimpleFastaParser(in_file):
+            seq = adjust_aa_seq(seq)
+            write_fasta_record(out_file, header, seq)
 
     return file_name
 
@@ -0,0 +1,109 @@
+"""A size limited cache of the output files from the wrapped programs.
+
+Outputs are stored under a hash of the input file's contents and the
+command line, so rerunning a program on the same input with the same
+options copies the old output instead of running the program again.
+The least recently used outputs are removed when the cache gets too big.
+"""
+
+import os
+import hashlib
+from os.path import abspath, exists, join
+from shutil import copyfile
+from tempfile import mkstemp
+
+GIGABYTE = 1024 ** 3
+BLOCK_SIZE = 1024 * 1024
+
+CACHE_DIR = None
+MAX_SIZE = 10 * GIGABYTE
+
+
+def setup(cache_dir, max_size=10):
+    """Turn on the cache. The maximum size is in gigabytes."""
+    global CACHE_DIR, MAX_SIZE
+    CACHE_DIR = abspath(cache_dir) if cache_dir else None
+    MAX_SIZE = int(max_size * GIGABYTE)
+    if CACHE_DIR:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+
+def key(input_file, cmd, ignore=None, output=None):
+    """Build the cache key from the input file contents and the command.
+
+    The input and output file names are taken out of the command so that
+    the same data in a different place will still match. So is the ignore
+    string, this is for options, like the thread count, that do not change
+    the output.
+    """
+    if not CACHE_DIR:
+        return None
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as in_file:
+        for block in iter(lambda: in_file.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    if output:  # The output's name is often the input's name plus more
+        cmd = cmd.replace(output, '{output}')
+    cmd = cmd.replace(input_file, '{input}')
+    if ignore:
+        cmd = cmd.replace(ignore, '')
+    digest.update(cmd.encode())
+    return digest.hexdigest()
+
+
+def cache_path(key_):
+    """Where the output for the key is stored."""
+    return join(CACHE_DIR, key_[:2], key_)
+
+
+def fetch(key_, output):
+    """Copy a cached output to the output file. Return True on a hit."""
+    if not key_:
+        return False
+    path = cache_path(key_)
+    try:
+        copyfile(path, output)
+        os.utime(path)  # Mark it as recently used
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def store(key_, output):
+    """Add an output file to the cache."""
+    if not key_ or not exists(output):
+        return
+    path = cache_path(key_)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp = mkstemp(dir=CACHE_DIR)
+    os.close(handle)
+    copyfile(output, temp)
+    os.replace(temp, path)
+    evict()
+
+
+def evict():
+    """Remove the least recently used outputs until the cache fits."""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        if root == CACHE_DIR:
+            continue  # Skip temp files being written
+        for name in files:
+            path = join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= MAX_SIZE:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
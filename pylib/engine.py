@@ -0,0 +1,348 @@
+"""Run the wrapped programs one at a time or many at once with asyncio.
+
+A wrapper is written as a generator that yields a Command for each
+program it needs to run and returns its output file. Decorating it with
+tool() gives a normal function that runs each command as it is yielded.
+The Engine runs the same generators concurrently.
+"""
+
+import os
+import time
+import signal
+import asyncio
+import logging
+import subprocess
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pylib import memory
+from pylib.failures import Failure
+
+REPORT_EVERY = 60  # Seconds between reports of the jobs in flight
+
+TASK_RECORDS = ContextVar('task_records', default=None)
+DEADLINE = ContextVar('deadline', default=(None, None))
+
+
+class Command:
+    """A program for a wrapper to run.
+
+    Programs that use a lot of memory give their kind and alignment size
+    (cells) so that the memory they need can be estimated and measured.
+    """
+
+    def __init__(self, cmd, cwd=None, stdout=None, kind=None, cells=0):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.stdout = stdout
+        self.kind = kind
+        self.cells = cells
+
+    def __str__(self):
+        return self.cmd
+
+
+def tool(func):
+    """Make a function that runs the commands from the generator function.
+
+    The generator function is kept in the __wrapped__ attribute so that it
+    can be handed to an Engine or used from other generators with steps().
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return drive(func(*args, **kwargs))
+    return wrapper
+
+
+def steps(tool_, *args, **kwargs):
+    """Get the command generator for a tool."""
+    return tool_.__wrapped__(*args, **kwargs)
+
+
+def drive(commands):
+    """Run each command as it is yielded and return the generator's value.
+
+    A failed command is raised inside the generator so it can clean up.
+    """
+    error = None
+    while True:
+        try:
+            command = commands.throw(error) if error else next(commands)
+        except StopIteration as stop:
+            return stop.value
+        error = None
+        try:
+            run_command(command)
+        except Exception as err:  # pylint: disable=broad-except
+            error = err
+
+
+def run_command(command):
+    """Run one command and wait for it, measure its memory if asked."""
+    out_file = open(command.stdout, 'wb') if command.stdout else None
+    try:
+        proc = subprocess.Popen(
+            command.cmd, shell=True, cwd=command.cwd, stdout=out_file,
+            start_new_session=True)
+        peak = 0
+        while True:
+            try:
+                returncode = proc.wait(timeout=wait_time(command))
+                break
+            except subprocess.TimeoutExpired:
+                if out_of_time():
+                    kill(proc.pid)
+                    proc.wait()
+                    raise timed_out(command)
+                peak = max(peak, memory.tree_rss(proc.pid))
+    finally:
+        if out_file:
+            out_file.close()
+
+    memory.record(command, peak)
+
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command.cmd)
+
+
+@contextmanager
+def time_limit(seconds):
+    """Kill the programs run inside this block after so many seconds."""
+    deadline = time.monotonic() + seconds if seconds else None
+    token = DEADLINE.set((deadline, seconds))
+    try:
+        yield
+    finally:
+        DEADLINE.reset(token)
+
+
+def time_left():
+    """Seconds until the time limit, or None if there isn't one."""
+    deadline, _ = DEADLINE.get()
+    return None if deadline is None else max(0, deadline - time.monotonic())
+
+
+def out_of_time():
+    """Has the time limit passed?"""
+    return time_left() == 0
+
+
+def wait_time(command):
+    """How long to wait for a program before checking on it again."""
+    times = [time_left()]
+    if command.kind:
+        times.append(memory.SAMPLE_EVERY)
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+
+def timed_out(command):
+    """The error for a program that ran out of time."""
+    _, seconds = DEADLINE.get()
+    return subprocess.TimeoutExpired(command.cmd, seconds)
+
+
+def kill(pid):
+    """Kill a program and anything it started."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class TaskLog(logging.Handler):
+    """Hold each task's log records so they are written out together."""
+
+    def __init__(self, handlers):
+        super().__init__()
+        self.real_handlers = handlers
+
+    def emit(self, record):
+        """Buffer the record if it came from a task."""
+        records = TASK_RECORDS.get()
+        if records is None:
+            self.write([record])
+        else:
+            records.append(record)
+
+    def write(self, records):
+        """Send records to the real log handlers."""
+        for record in records:
+            for handler in self.real_handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+class Engine:
+    """Run the commands from many tools at once with asyncio.
+
+    At most "limit" programs run at the same time. Only a few more tasks
+    than that are started at once, the rest wait in a queue. Program
+    output sent to stdout goes straight to its file. If there is a memory
+    budget (in bytes) a program only starts when its estimated memory
+    fits, or when nothing else is running.
+    """
+
+    def __init__(self, limit, max_mem=None, report_every=REPORT_EVERY):
+        self.limit = limit
+        self.max_mem = max_mem
+        self.report_every = report_every
+        self.semaphore = None
+        self.in_flight = {}
+        self.log = None
+        self.model = memory.MODEL
+        self.mem_used = 0
+        self.mem_free = None
+
+    def map(self, tool_, args, paths):
+        """Run tool_(args, path) for every path and return the results."""
+        return asyncio.run(self._map(tool_, args, paths))
+
+    async def _map(self, tool_, args, paths):
+        self.semaphore = asyncio.Semaphore(self.limit)
+        self.mem_free = asyncio.Condition()
+        queue = asyncio.Queue(maxsize=self.limit)
+        results = []
+        errors = []
+
+        root = logging.getLogger()
+        handlers = root.handlers
+        self.log = TaskLog(handlers)
+        root.handlers = [self.log]
+
+        async def worker():
+            while True:
+                path = await queue.get()
+                try:
+                    results.append(await self.task(tool_, args, path))
+                except Exception as err:  # pylint: disable=broad-except
+                    errors.append(err)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker())
+                   for _ in range(2 * self.limit)]
+        reporter = asyncio.create_task(self.report())
+
+        try:
+            for path in paths:
+                if errors:
+                    break
+                await queue.put(path)
+            await queue.join()
+        finally:
+            for task in workers + [reporter]:
+                task.cancel()
+            root.handlers = handlers
+
+        if errors:
+            raise errors[0]
+
+        return results
+
+    async def task(self, tool_, args, path):
+        """Run the commands for one path, its log records are held.
+
+        An error is logged and returned as a Failure so the other paths
+        keep going.
+        """
+        records = []
+        token = TASK_RECORDS.set(records)
+        try:
+            with time_limit(getattr(args, 'timeout', None)):
+                return await self.call(path, steps(tool_, args, path))
+        except Exception as err:  # pylint: disable=broad-except
+            logging.error('{} failed: {!r}'.format(path, err))
+            return Failure(path, repr(err))
+        finally:
+            TASK_RECORDS.reset(token)
+            self.log.write(records)
+
+    async def call(self, name, commands):
+        """Run each command as it is yielded."""
+        error = None
+        while True:
+            try:
+                command = commands.throw(error) if error else next(commands)
+            except StopIteration as stop:
+                return stop.value
+            error = None
+            try:
+                await self.run_command(name, command)
+            except Exception as err:  # pylint: disable=broad-except
+                error = err
+
+    async def run_command(self, name, command):
+        """Run one command when there is room for it."""
+        need = await self.admit(command)
+        peak = 0
+        try:
+            async with self.semaphore:
+                key = object()
+                self.in_flight[key] = (name, command.cmd, time.monotonic())
+                try:
+                    returncode, peak = await self.wait_for(command)
+                finally:
+                    del self.in_flight[key]
+        finally:
+            self.model.update(command.kind, command.cells, peak)
+            await self.release(need)
+
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, command.cmd)
+
+    async def wait_for(self, command):
+        """Start the program and sample its memory until it is done."""
+        out_file = open(command.stdout, 'wb') if command.stdout else None
+        try:
+            proc = await asyncio.create_subprocess_shell(
+                command.cmd, cwd=command.cwd, stdout=out_file,
+                start_new_session=True)
+            done = asyncio.ensure_future(proc.wait())
+            peak = 0
+            while True:
+                await asyncio.wait([done], timeout=wait_time(command))
+                if done.done():
+                    return done.result(), peak
+                if out_of_time():
+                    kill(proc.pid)
+                    await done
+                    raise timed_out(command)
+                peak = max(peak, memory.tree_rss(proc.pid))
+        finally:
+            if out_file:
+                out_file.close()
+
+    async def admit(self, command):
+        """Wait until the command's estimated memory fits in the budget.
+
+        The estimate is redone each time we check because finished
+        programs change it.
+        """
+        def fits():
+            need = self.model.estimate(command.kind, command.cells)
+            return not self.max_mem or not self.mem_used \
+                or self.mem_used + need <= self.max_mem
+
+        async with self.mem_free:
+            await self.mem_free.wait_for(fits)
+            need = self.model.estimate(command.kind, command.cells)
+            self.mem_used += need
+        return need
+
+    async def release(self, need):
+        """Give back the memory a program was using."""
+        async with self.mem_free:
+            self.mem_used -= need
+            self.mem_free.notify_all()
+
+    async def report(self):
+        """Log the programs that are running now and then."""
+        while True:
+            await asyncio.sleep(self.report_every)
+            now = time.monotonic()
+            jobs = sorted(self.in_flight.values(), key=lambda j: j[2])
+            logging.info('{} programs running'.format(len(jobs)))
+            for name, cmd, start in jobs:
+                logging.info('    {:.0f}s {}: {}'.format(
+                    now - start, name, cmd.split()[0]))
@@ -0,0 +1,86 @@
+"""Keep going when a gene fails, retry the failures, and list them.
+
+A failed gene is returned as a Failure instead of raising an error so the
+other genes carry on. After all of the genes have been tried the failed
+ones are retried, each retry with more forgiving options. Genes that still
+fail are written to a JSON lines file in the output directory.
+"""
+
+import json
+import logging
+from copy import copy
+from os.path import join
+
+FAILURES = 'failures.jsonl'
+
+
+class Failure:
+    """A gene that raised an error."""
+
+    def __init__(self, path, error):
+        self.path = path
+        self.error = error
+
+    def __repr__(self):
+        return 'Failure({!r}, {!r})'.format(self.path, self.error)
+
+
+def failed(result):
+    """Is the result from a failed gene?"""
+    return isinstance(result, Failure)
+
+
+def run_with_retries(run, args, paths, escalations=()):
+    """Call run(args, paths), then retry the failures up to --retries times.
+
+    Each retry uses the next escalation, a dict of argument changes, that
+    is more likely to work. The last one is reused if we run out.
+    """
+    results = []
+    errors = {}
+    retries = getattr(args, 'retries', 0)
+
+    for attempt in range(retries + 1):
+        if attempt:
+            logging.info('retry {} of {} for {} failed genes'.format(
+                attempt, retries, len(paths)))
+            args = escalate(args, escalations, attempt)
+
+        outcome = run(args, paths)
+
+        results += [r for r in outcome if not failed(r)]
+        paths = [r.path for r in outcome if failed(r)]
+        for failure in outcome:
+            if failed(failure):
+                errors.setdefault(failure.path, []).append(failure.error)
+
+        if not paths:
+            break
+
+    write_failures(args.output_dir, paths, errors)
+    return results
+
+
+def escalate(args, escalations, attempt):
+    """Change the arguments for a retry."""
+    if not escalations:
+        return args
+    args = copy(args)
+    changes = escalations[min(attempt, len(escalations)) - 1]
+    for key, value in changes.items():
+        setattr(args, key, value)
+    logging.info('retrying with {}'.format(changes))
+    return args
+
+
+def write_failures(output_dir, paths, errors):
+    """Write the genes that failed every try. It is empty if none did."""
+    path = join(output_dir, FAILURES)
+    with open(path, 'w') as out_file:
+        for gene in paths:
+            out_file.write(json.dumps({
+                'path': gene,
+                'tries': len(errors[gene]),
+                'errors': errors[gene]}) + '\n')
+    if paths:
+        logging.warning('{} genes failed, see {}'.format(len(paths), path))
@@ -0,0 +1,200 @@
+"""Run per-gene jobs in a process pool."""
+
+import logging
+from collections import deque
+from copy import copy
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait)
+from pylib import engine
+from pylib import memory
+from pylib.failures import Failure
+
+
+class LogBuffer(logging.Handler):
+    """Hold a job's log records so they can be written out together."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        """Save a record in a form that can be sent between processes."""
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+
+def split_cpus(cpus, jobs):
+    """Split the CPU budget into concurrent jobs and threads per job."""
+    if jobs > cpus:
+        logging.warning(
+            '--jobs {} is more than --cpus {}, running {} at a time'.format(
+                jobs, cpus, max(1, cpus)))
+    jobs = max(1, min(jobs, cpus))
+    threads = max(1, cpus // jobs)
+    return jobs, threads
+
+
+def share_cpus(cpus, costs):
+    """Give each job a share of the CPUs in proportion to its cost."""
+    total = sum(costs) or 1
+    return [min(cpus, max(1, round(cpus * c / total))) for c in costs]
+
+
+def guard(func, args, path):
+    """Run one job with the --timeout, return a Failure if it fails."""
+    try:
+        with engine.time_limit(getattr(args, 'timeout', None)):
+            return func(args, path)
+    except Exception as err:  # pylint: disable=broad-except
+        logging.error('{} failed: {!r}'.format(path, err))
+        return Failure(path, repr(err))
+
+
+def run_job(func, args, path):
+    """Run one job and return its result, log records, and memory use."""
+    root = logging.getLogger()
+    handlers = root.handlers
+    buffer = LogBuffer()
+    root.handlers = [buffer]
+    memory.take_measured()
+    try:
+        result = guard(func, args, path)
+    finally:
+        root.handlers = handlers
+    return result, buffer.records, memory.take_measured()
+
+
+def write_records(records):
+    """Write a job's buffered log records to the real log handlers."""
+    root = logging.getLogger()
+    for record in records:
+        root.handle(record)
+
+
+def run_jobs(func, args, paths, cost=None, size=None):
+    """Run func(args, path) for every path using a pool of processes.
+
+    The --cpus budget is split between the number of concurrent jobs and
+    the threads given to the wrapped programs in each job. If a cost
+    function is given the jobs are scheduled by cost, see run_by_cost().
+    The size function gives the (kind, cells) used to estimate a job's
+    memory. The log output from each job is written together once the job
+    finishes. A job that fails gives a Failure in place of its result.
+    """
+    jobs, threads = split_cpus(args.cpus, args.jobs)
+
+    if jobs == 1:
+        return run_serial(func, args, paths)
+
+    if cost:
+        return run_by_cost(func, args, paths, cost, jobs, size)
+
+    logging.info('running {} jobs with {} CPUs each'.format(jobs, threads))
+
+    job_args = copy(args)
+    job_args.cpus = threads
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_job, func, job_args, p) for p in paths]
+        for future in as_completed(futures):
+            results.append(job_result(pool, future))
+
+    return results
+
+
+def run_serial(func, args, paths):
+    """Run the jobs one at a time in this process."""
+    results = []
+    for path in paths:
+        memory.take_measured()
+        results.append(guard(func, args, path))
+        learn(memory.MODEL, memory.take_measured())
+    return results
+
+
+def run_by_cost(func, args, paths, cost, jobs, size=None):
+    """Run the most expensive jobs first.
+
+    Each job asks for a share of the CPUs in proportion to its estimated
+    cost. Jobs are started in order of decreasing cost with as many of
+    the CPUs they asked for as are free, so the big jobs start early with
+    more threads and the small ones are packed into the remaining CPUs.
+
+    With a --max-mem budget a job is only started if its estimated memory
+    fits in what is left. If the next job does not fit a smaller one that
+    does is started instead. The memory measured for finished jobs, here
+    and in earlier runs in this process, is used to correct the estimates.
+    """
+    costs = [cost(p) for p in paths]
+    wants = share_cpus(args.cpus, costs)
+    pending = deque(sorted(zip(costs, wants, paths), key=lambda j: -j[0]))
+
+    model = memory.MODEL
+    max_mem = memory.budget(getattr(args, 'max_mem', None))
+    sizes = {p: size(p) if size else (None, 0) for p in paths}
+
+    logging.info('scheduling {} jobs on {} CPUs, largest first'.format(
+        len(pending), args.cpus))
+
+    results = []
+    free = args.cpus
+    used = 0
+    running = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            while pending and free and len(running) < jobs:
+                job = next_job(pending, model, sizes, used, max_mem)
+                if not job:
+                    break
+                pending.remove(job)
+                _, want, path = job
+                need = model.estimate(*sizes[path])
+                used += need
+                job_args = copy(args)
+                job_args.cpus = min(want, free)
+                free -= job_args.cpus
+                future = pool.submit(run_job, func, job_args, path)
+                running[future] = (job_args.cpus, need)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                cpus, need = running.pop(future)
+                free += cpus
+                used -= need
+                results.append(job_result(pool, future, model))
+
+    return results
+
+
+def next_job(pending, model, sizes, used, max_mem):
+    """Find the most expensive pending job that fits in the memory left."""
+    for job in pending:
+        need = model.estimate(*sizes[job[2]])
+        if not max_mem or not used or used + need <= max_mem:
+            return job
+    return None
+
+
+def job_result(pool, future, model=None):
+    """Write the log records for a finished job and return its result."""
+    try:
+        result, records, measured = future.result()
+    except Exception:
+        pool.shutdown(cancel_futures=True)
+        raise
+    write_records(records)
+    if model:
+        learn(model, measured)
+    return result
+
+
+def learn(model, measured):
+    """Update the memory model with the peaks measured for a job."""
+    for kind, cells, peak in measured:
+        model.update(kind, cells, peak)
@@ -0,0 +1,186 @@
+"""Keep track of finished work so that an interrupted run can be resumed."""
+
+import os
+import json
+import logging
+import sqlite3
+import hashlib
+from functools import lru_cache, wraps
+from inspect import isgeneratorfunction
+from os.path import abspath, basename, exists, join
+from shutil import which
+from pylib import util
+
+MANIFEST = 'manifest.sqlite'
+BLOCK_SIZE = 1024 * 1024
+
+
+class Manifest:
+    """An SQLite record of the per-file work done in an output directory.
+
+    Each record holds the hash of the input files, the step parameters,
+    the versions of the programs used, and the step's output.
+    """
+
+    def __init__(self, output_dir):
+        self.path = join(output_dir, MANIFEST)
+        self.output_dir = output_dir
+        self.cxn = sqlite3.connect(self.path, timeout=60)
+        with self.cxn:
+            self.cxn.execute("""
+                CREATE TABLE IF NOT EXISTS manifest (
+                    step       TEXT,
+                    inputs     TEXT,
+                    input_hash TEXT,
+                    params     TEXT,
+                    versions   TEXT,
+                    result     TEXT,
+                    PRIMARY KEY (step, inputs))""")
+
+    def close(self):
+        """Close the database connection."""
+        self.cxn.close()
+
+    def done(self, step, inputs, params, versions):
+        """Return (True, result) if the work is done and still valid."""
+        row = self.cxn.execute(
+            """SELECT input_hash, params, versions, result
+                 FROM manifest
+                WHERE step = ? AND inputs = ?""",
+            (step, json.dumps(inputs))).fetchone()
+
+        if not row:
+            return False, None
+
+        if row[1] != json.dumps(params, sort_keys=True) \
+                or row[2] != json.dumps(versions, sort_keys=True) \
+                or row[0] != hash_files(inputs):
+            return False, None
+
+        result = json.loads(row[3])
+        if not all(exists(p) for p in self.output_paths(result)):
+            return False, None
+
+        return True, result
+
+    def record(self, step, inputs, params, versions, result):
+        """Save a finished piece of work."""
+        with self.cxn:
+            self.cxn.execute(
+                """INSERT OR REPLACE INTO manifest
+                        (step, inputs, input_hash, params, versions, result)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (step,
+                 json.dumps(inputs),
+                 hash_files(inputs),
+                 json.dumps(params, sort_keys=True),
+                 json.dumps(versions, sort_keys=True),
+                 json.dumps(result)))
+
+    def output_paths(self, result):
+        """The output files for a step result; they're in the output dir."""
+        if result is None:
+            return []
+        if isinstance(result, str):
+            result = [result]
+        return [join(self.output_dir, basename(p)) for p in result]
+
+
+def hash_files(paths):
+    """Hash the contents of the files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as in_file:
+            for block in iter(lambda: in_file.read(BLOCK_SIZE), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def tool_version(tool):
+    """Identify the installed version of a program.
+
+    We use the path, size, and modification time of the executable so
+    that we don't have to know how to ask every program for its version.
+    It changes whenever the program is upgraded or replaced.
+    """
+    path = which(tool)
+    if not path:
+        return ''
+    stat = os.stat(path)
+    return '{} {} {}'.format(path, stat.st_size, int(stat.st_mtime))
+
+
+class Work:
+    """A step's work on one set of input files."""
+
+    def __init__(self, step, params, tools, args, input_files, files=()):
+        self.step = step
+        self.output_dir = args.output_dir
+        self.force = getattr(args, 'force', False)
+        self.input_files = input_files
+        self.inputs = [abspath(p) for p in input_files]
+        self.params = {p: getattr(args, p, None) for p in params}
+        for param in files:
+            path = getattr(args, param, None)
+            self.params[param] = hash_files([path]) if path else None
+        self.versions = {t: tool_version(t) for t in tools}
+        self.versions['pylib'] = util.__VERSION__
+        self.result = None
+
+    def done(self):
+        """Check the manifest, if the work is done keep its result."""
+        if self.force:
+            return False
+        manifest = Manifest(self.output_dir)
+        try:
+            done, self.result = manifest.done(
+                self.step, self.inputs, self.params, self.versions)
+        finally:
+            manifest.close()
+        if done:
+            logging.info('{} already done: {}'.format(
+                self.step, ', '.join(self.input_files)))
+        return done
+
+    def record(self, result):
+        """Add the finished work to the manifest."""
+        manifest = Manifest(self.output_dir)
+        try:
+            manifest.record(
+                self.step, self.inputs, self.params, self.versions, result)
+        finally:
+            manifest.close()
+
+
+def resumable(step, params=(), tools=(), files=()):
+    """Skip a per-file step function when its work is already done.
+
+    The decorated function is called as func(args, *input_files). The step
+    is redone if an input file changed, if any of the named arguments or
+    program versions changed, if any of the outputs are missing, or if
+    the --force option is used. The files are arguments that name other
+    files the step reads, their contents are checked like the inputs.
+    Generator functions (see engine.tool) are handled too.
+    """
+    def decorator(func):
+        if isgeneratorfunction(func):
+            @wraps(func)
+            def wrapper(args, *input_files):
+                work = Work(step, params, tools, args, input_files, files)
+                if work.done():
+                    return work.result
+                result = yield from func(args, *input_files)
+                work.record(result)
+                return result
+        else:
+            @wraps(func)
+            def wrapper(args, *input_files):
+                work = Work(step, params, tools, args, input_files, files)
+                if work.done():
+                    return work.result
+                result = func(args, *input_files)
+                work.record(result)
+                return result
+        return wrapper
+    return decorator
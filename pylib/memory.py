@@ -0,0 +1,108 @@
+"""Estimate and measure the memory used by the wrapped programs.
+
+RAxML memory grows with the number of taxa times the number of
+alignment columns, and PASTA is far hungrier than that. We start with a
+guess of the bytes used per alignment cell for each kind of program and
+replace it with what we see when the programs actually run.
+"""
+
+import os
+from pylib import bio
+
+GIGABYTE = 1024 ** 3
+MEGABYTE = 1024 ** 2
+
+BASE = 64 * MEGABYTE  # Every program uses at least this much
+SAMPLE_EVERY = 1.0  # Seconds between memory samples of a running program
+
+BYTES_PER_CELL = {
+    'raxml dna': 200,
+    'raxml aa': 1_000,
+    'pasta dna': 5_000,
+    'pasta aa': 10_000,
+}
+
+MEASURED = []  # (kind, cells, peak bytes) for programs run by this process
+
+
+class Model:
+    """Estimate peak memory from the alignment size, learn from runs."""
+
+    def __init__(self):
+        self.per_cell = dict(BYTES_PER_CELL)
+        self.learned = set()
+
+    def estimate(self, kind, cells):
+        """Estimate the peak memory in bytes for a program."""
+        if not kind:
+            return 0
+        return BASE + int(self.per_cell.get(kind, 0) * cells)
+
+    def update(self, kind, cells, peak):
+        """Use a measured peak to improve the estimates for its kind.
+
+        The first measurement replaces the starting guess. After that we
+        keep the largest bytes per cell seen so the estimate stays safe.
+        """
+        if not kind or not cells or not peak:
+            return
+        per_cell = max(0, peak - BASE) / cells
+        if kind in self.learned:
+            per_cell = max(per_cell, self.per_cell[kind])
+        self.per_cell[kind] = per_cell
+        self.learned.add(kind)
+
+
+MODEL = Model()  # What this process has learned from all of its jobs
+
+
+def budget(max_mem):
+    """Convert the --max-mem option from gigabytes to bytes."""
+    return int(max_mem * GIGABYTE) if max_mem else None
+
+
+def kind(program, seq_type):
+    """Build the key for the memory model."""
+    return '{} {}'.format(program, seq_type)
+
+
+def alignment_cells(fasta):
+    """The size of an alignment: taxa times columns."""
+    return bio.fasta_record_count(fasta) * bio.longest_fasta_seq(fasta)
+
+
+def tree_rss(pid):
+    """Add up the resident memory of a process and all of its children.
+
+    This reads Linux's /proc file system. It returns 0 when it can't.
+    """
+    total = 0
+    stack = [pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open('/proc/{}/status'.format(pid)) as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir('/proc/{}/task'.format(pid)):
+                children = '/proc/{}/task/{}/children'.format(pid, task)
+                with open(children) as in_file:
+                    stack += [int(c) for c in in_file.read().split()]
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def record(command, peak):
+    """Save a program's measured peak memory."""
+    if command.kind and peak:
+        MEASURED.append((command.kind, command.cells, peak))
+
+
+def take_measured():
+    """Get and clear the measurements made by this process."""
+    measured = list(MEASURED)
+    MEASURED.clear()
+    return measured
@@ -1,63 +1,190 @@
+import os
+import re
 import sys
+import mmap
 from shlex import shlex
-from pylib.phylo3 import Node
-from io import StringIO
-
-
-class Tokenizer(shlex):
-    """Provides tokens for parsing Newick-format trees"""
-    def __init__(self, infile):
-        shlex.__init__(self, infile)
-        self.commenters = ''
-        self.wordchars = self.wordchars+'-.@'
-        self.quotes = "'"
-
-    def parse_comment(self):
-        while 1:
-            token = self.get_token()
-            if token == '':
-                sys.stdout.write('EOF encountered mid-comment!\n')
-                break
-            elif token == ']':
-                break
-            elif token == '[':
-                self.parse_comment()
-            else:
-                pass
+from pylib import binary_trees
+from pylib.phylo3 import Node, gc_paused
+
+# We used to tokenize with shlex, these are the characters it put in words
+WORDCHARS = shlex('', posix=False).wordchars + '-.@'
+WHITESPACE = ' \t\r\n'
+
+# Trees with nothing but ASCII words and '(),:;' are split up in one go
+# into '(', ',', and ')' each followed by the label and the branch length
+# after it. Whitespace next to punctuation is dropped first. Any other tree
+# goes through the tokenizer.
+ASCII_WORDCHARS = ''.join(c for c in WORDCHARS if c.isascii())
+SIMPLE_SPLIT = re.compile(r'([(),])')
+SPACED = re.compile(r'[{space}]*([(),:])[{space}]*'.format(space=WHITESPACE))
+NOT_SIMPLE = re.compile(r'[^(),:;{word}]'.format(
+    word=re.escape(ASCII_WORDCHARS)))
+
+# The tokenizer. A token is a word, a quoted label kept with its quotes,
+# or any other single character. A quote without a closing one is matched
+# on its own so we can complain about it.
+TOKEN = r"[{space}]*([{word}][{word}']*|'[^']*'|'|[^{space}])"
+TEXT_TOKENS = re.compile(TOKEN.format(
+    word=re.escape(WORDCHARS), space=WHITESPACE))
+
+# For bytes, e.g. memory-mapped files. Non-ASCII bytes are word characters
+BYTE_TOKENS = re.compile(TOKEN.format(
+    word=re.escape(ASCII_WORDCHARS) + r'\x80-\xff',
+    space=WHITESPACE).encode('ascii'))
+
+# The space between trees
+TEXT_SPACE = re.compile('[{}]*'.format(WHITESPACE))
+BYTE_SPACE = re.compile(TEXT_SPACE.pattern.encode('ascii'))
+
+
+class NotSimple(Exception):
+    """the tree needs the tokenizer"""
+
+
+def tokenize(text, pos=0):
+    """
+    yield (token, end position) from pos. text is a string or a bytes-like
+    object such as an mmap
+    """
+    if isinstance(text, str):
+        for match in TEXT_TOKENS.finditer(text, pos):
+            yield match.group(1), match.end()
+    else:
+        for match in BYTE_TOKENS.finditer(text, pos):
+            yield match.group(1).decode('utf-8'), match.end()
 
 
 def parse(raw, ttable=None):
     """
     Parse a Newick-formatted tree description
-    input is any file-like object that can be coerced into shlex,
-    or a string (converted to StringIO)
+    input is a string, a bytes-like object such as an mmap, or a file-like
+    object whose position is left unchanged
+    """
+    if not isinstance(raw, (str, bytes, bytearray, mmap.mmap)):
+        start_pos = raw.tell()
+        text = raw.read()
+        raw.seek(start_pos)
+        raw = text
+
+    return parse_at(raw, 0, ttable)[0]
+
+
+def parse_at(text, pos=0, ttable=None):
+    """
+    parse the tree that starts at pos in the text. returns the root and
+    the position after the tree's ';'
     """
-    if type(raw) is str:
-        raw = StringIO(raw)
+    with gc_paused():
+        semicolon = ';' if isinstance(text, str) else b';'
+        end = text.find(semicolon, pos)
+        end = len(text) if end < 0 else end + 1
+        try:
+            tree = text[pos:end]
+            if not isinstance(tree, str):
+                tree = tree.decode('utf-8')
+            tree = tree.rstrip(';').strip(WHITESPACE)
+            if NOT_SIMPLE.search(tree):
+                tree = SPACED.sub(r'\1', tree)
+                if NOT_SIMPLE.search(tree):
+                    raise NotSimple()
+            return parse_simple(tree, ttable), end
+        except (NotSimple, UnicodeDecodeError):
+            return parse_tokens(text, pos, ttable)
 
-    start_pos = raw.tell()
-    tokens = Tokenizer(raw)
+
+def parse_simple(tree, ttable=None):
+    """
+    parse a tree without quotes, comments, whitespace, or a ';' from its
+    pieces. raises NotSimple for anything odd so that parse_tokens can deal
+    with it, and report the error
+
+    the nodes are new so children are linked directly instead of with
+    add_child, there are no summaries to clear
+    """
+    pieces = SIMPLE_SPLIT.split(tree)
+    if pieces[0]:
+        raise NotSimple()
+
+    node = None
+    depth = 0
+
+    try:
+        for token, word in zip(pieces[1::2], pieces[2::2]):
+            label, colon, length = word.partition(':')
+
+            # internal node
+            if token == '(':
+                depth += 1
+                new_node = Node()
+                if node:
+                    node.children.append(new_node)
+                    new_node.parent = node
+                node = new_node
+
+            elif token == ',':
+                node = node.parent
+
+            # internal node label
+            else:
+                depth -= 1
+                node = node.parent
+                if label:
+                    node.label = label
+                if colon:
+                    node.length = float(length)
+                continue
+
+            # leaf node
+            if label:
+                if ttable:
+                    ttoken = ttable.get(label) or ttable.get(int(label))
+                    if ttoken:
+                        label = ttoken
+                new_node = Node()
+                new_node.label = label
+                new_node.istip = True
+                node.children.append(new_node)
+                new_node.parent = node
+                node = new_node
+            if colon:
+                node.length = float(length)
+
+    # a bad branch length, or a translation table problem that the
+    # tokenizer will report
+    except ValueError:
+        raise NotSimple()
+
+    if depth:
+        raise NotSimple()
+
+    return node
+
+
+def parse_tokens(text, pos=0, ttable=None):
+    """
+    parse a tree one token at a time. returns the root and the position
+    after the tree's ';'
+    """
+    tokens = tokenize(text, pos)
 
     node = None
     lp = 0
     rp = 0
+    end = len(text)
 
     prev_tok = None
 
-    while 1:
-        token = tokens.get_token()
-        if token == ';' or token == '':
-            assert lp == rp, \
-                   'unbalanced parentheses in tree description'
+    for token, end in tokens:
+        if token == ';':
             break
 
         # internal node
         elif token == '(':
             lp = lp+1
             new_node = Node()
-            new_node.istip = False
             if node:
-                node.add_child(new_node)
+                node.children.append(new_node)
+                new_node.parent = node
             node = new_node
 
         elif token == ')':
@@ -69,9 +196,10 @@ def parse(raw, ttable=None):
 
         # branch length
         elif token == ':':
-            token = tokens.get_token()
+            token = next(tokens, ('', end))[0]
 
             if not (token == ''):
+                check_quote(token)
                 try:
                     brlen = float(token)
                 except ValueError:
@@ -86,10 +214,11 @@ def parse(raw, ttable=None):
             node.length = brlen
         # comment
         elif token == '[':
-            tokens.parse_comment()
+            skip_comment(tokens)
 
         # leaf node or internal node label
         else:
+            check_quote(token)
             if prev_tok != ')': # leaf node
                 if ttable:
                     ttoken = ttable.get(token) or ttable.get(int(token))
@@ -98,7 +227,8 @@ def parse(raw, ttable=None):
                 newnode = Node()
                 newnode.label = token
                 newnode.istip = True
-                node.add_child(newnode)
+                node.children.append(newnode)
+                newnode.parent = node
                 node = newnode
             else: # label
                 # translation table for internal nodes labels?
@@ -106,9 +236,30 @@ def parse(raw, ttable=None):
 
         prev_tok = token
 
-    raw.seek(start_pos)
+    assert lp == rp, 'unbalanced parentheses in tree description'
 
-    return node
+    return node, end
+
+
+def check_quote(token):
+    if token == "'":
+        raise ValueError('No closing quotation')
+
+
+def skip_comment(tokens):
+    """
+    skip the tokens of a (nested) comment, the '[' is already read
+    """
+    depth = 1
+    for token, _ in tokens:
+        check_quote(token)
+        if token == ']':
+            depth -= 1
+            if not depth:
+                return
+        elif token == '[':
+            depth += 1
+    sys.stdout.write('EOF encountered mid-comment!\n')
 
 
 def traverse(node):
@@ -118,36 +269,114 @@ def traverse(node):
         return node.next.back
 
 
-def to_string(node, length_fmt=":%s"):
-    if not node.istip:
-        node_str = "(%s)%s" % \
-                   (",".join([ to_string(child, length_fmt) \
-                               for child in node.children ]),
-                    node.label or ""
-                    )
-    else:
-        node_str = "%s" % node.label
+def length_format(precision=None):
+    """
+    the format for branch lengths. precision is the number of significant
+    digits, None writes them in full
+    """
+    if precision is None:
+        return ":%s"
+    return ":%%.%dg" % precision
 
-    if node.length is not None:
-        length_str = length_fmt % node.length
-    else:
-        length_str = ""
 
-    s = "%s%s" % (node_str, length_str)
-    return s
+def pieces(node, length_fmt=":%s"):
+    """
+    yield the tree in Newick format piece by piece. the pieces come in
+    order from an explicit stack, so deep trees don't hit the recursion
+    limit and nothing is copied over and over
+    """
+    stack = [(node, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node is None:
+            yield ","
+            continue
+
+        if not node.istip:
+            if not expanded:
+                yield "("
+                stack.append((node, True))
+                for i, child in enumerate(reversed(node.children)):
+                    if i:
+                        stack.append((None, False))
+                    stack.append((child, False))
+                continue
+            yield ")%s" % (node.label or "")
+        else:
+            yield "%s" % node.label
+
+        if node.length is not None:
+            yield length_fmt % node.length
+
+
+def to_string(node, length_fmt=":%s", precision=None):
+    """
+    write the tree in Newick format, without the ';'
+    """
+    if precision is not None:
+        length_fmt = length_format(precision)
+    return "".join(pieces(node, length_fmt))
+
+
+def write_tree(node, out_file, precision=None):
+    """
+    write the tree and its ';' to an open file. the pieces go straight into
+    the file's buffer, the whole tree is never built as one string
+    """
+    out_file.writelines(pieces(node, length_format(precision)))
+    out_file.write(";\n")
+
+
+def write_trees(trees, out_file, precision=None):
+    """
+    write the trees to an open file one after the other
+    """
+    length_fmt = length_format(precision)
+    for node in trees:
+        out_file.writelines(pieces(node, length_fmt))
+        out_file.write(";\n")
 
 
 tostring = to_string
 
 
 def parse_from_file(filename):
+    """
+    parse the first tree in a file
+    """
+    return next(trees_from_file(filename), None)
+
+
+def iter_trees(text, ttable=None):
+    """
+    parse the trees in a string or a bytes-like object such as an mmap one
+    at a time. empty trees are skipped
+    """
+    space = TEXT_SPACE if isinstance(text, str) else BYTE_SPACE
+    pos = 0
+    while True:
+        pos = space.match(text, pos).end()
+        if pos >= len(text):
+            return
+        tree, pos = parse_at(text, pos, ttable)
+        if tree is not None:
+            yield tree
+
+
+def trees_from_file(filename, ttable=None):
+    """
+    parse the trees in a file one at a time. the file is memory-mapped so
+    it isn't read into memory all at once. files in the binary format, see
+    binary_trees, are read too
+    """
     if filename == '-':
-        file = sys.stdin
-    else:
-        file = open(filename, 'r')
-    content = file.read()
-    content = content.strip()
-    treedescs = content.split(';')
-    tree = parse(treedescs[0])
-    file.close()
-    return tree
+        yield from iter_trees(sys.stdin.read(), ttable)
+        return
+    with open(filename, 'rb') as in_file:
+        if not os.fstat(in_file.fileno()).st_size:
+            return
+        with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mem:
+            if binary_trees.is_binary(mem):
+                yield from binary_trees.iter_trees(mem)
+            else:
+                yield from iter_trees(mem, ttable)
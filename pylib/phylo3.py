@@ -1,61 +1,226 @@
+import gc
+from contextlib import contextmanager
+
 PREORDER = 0
 POSTORDER = 1
 BRANCHLENGTH = 0
 INTERNODES = 1
 
+TAXON_BITS = {}  # taxon ID -> its bit in the taxon masks
+TAXON_IDS = []  # bit -> taxon ID
+
+
+def taxon_name(label):
+    """get the taxon ID from a tip label"""
+    return label.split("@")[0]
+
+
+def taxon_bit(name):
+    """the bit for a taxon ID in the taxon masks"""
+    bit = TAXON_BITS.get(name)
+    if bit is None:
+        bit = TAXON_BITS[name] = len(TAXON_IDS)
+        TAXON_IDS.append(name)
+    return bit
+
+
+def taxon_names(mask):
+    """the set of taxon IDs in a taxon mask"""
+    names = set()
+    while mask:
+        low = mask & -mask
+        names.add(TAXON_IDS[low.bit_length() - 1])
+        mask ^= low
+    return names
+
+
+@contextmanager
+def gc_paused():
+    """
+    pause the cyclic garbage collector. building a tree makes lots of
+    parent-child cycles that are all live, so collecting while we build
+    only rescans the tree again and again
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
 
 class Node:
+    """
+    a tree node. slots keep big trees small: data and excluded_dists are
+    only created when they are first used.
+
+    a summary of the tips under each node (tip count, taxon mask, and
+    whether a taxon repeats) and the LCAIndex of a subtree are cached.
+    add_child and remove_child clear them for the node and its ancestors,
+    so edit trees through them
+    """
+    __slots__ = ('isroot', 'istip', 'label', 'length', 'parent', 'children',
+                 '_data', '_excluded_dists', '_summary', '_lca_index')
+
     def __init__(self):
-        self.data = {}
         self.isroot = False
         self.istip = False
         self.label = None
         self.length = 0
         self.parent = None
         self.children = []
-        self.nchildren = 0
-        self.excluded_dists = []
+        self._data = None
+        self._excluded_dists = None
+        self._summary = None
+        self._lca_index = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = {}
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def excluded_dists(self):
+        if self._excluded_dists is None:
+            self._excluded_dists = []
+        return self._excluded_dists
+
+    @excluded_dists.setter
+    def excluded_dists(self, value):
+        self._excluded_dists = value
+
+    @property
+    def nchildren(self):
+        return len(self.children)
 
     def order_subtrees_by_size(self, n2s=None, recurse=False, reverse=False):
         if n2s is None:
             n2s = node2size(self)
-        if not self.istip:
-            v = [(n2s[c], c.label, c) for c in self.children]
-            v.sort()
-            if reverse:
-                v.reverse()
-            self.children = [x[-1] for x in v]
-            if recurse:
-                for c in self.children:
-                    c.order_subtrees_by_size(
-                        n2s, recurse=True, reverse=reverse)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if not node.istip:
+                v = [(n2s[c], c.label, c) for c in node.children]
+                v.sort()
+                if reverse:
+                    v.reverse()
+                node.children = [x[-1] for x in v]
+                if recurse:
+                    stack.extend(node.children)
 
     def add_child(self, child):
         assert child not in self.children
         self.children.append(child)
         child.parent = self
-        self.nchildren += 1
+        self.invalidate()
 
     def remove_child(self, child):
         assert child in self.children
         self.children.remove(child)
         child.parent = None
-        self.nchildren -= 1
+        self.invalidate()
+
+    def replace_child(self, child, new_child):
+        """put new_child in child's place, keeping the order of children"""
+        index = self.children.index(child)
+        if new_child.parent is not None:
+            new_child.parent.remove_child(new_child)
+        self.children[index] = new_child
+        child.parent = None
+        new_child.parent = self
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        clear the cached summaries and LCA indexes of this node and its
+        ancestors. a node is only cached if all of its descendants are, so
+        we can stop at the first node that isn't
+        """
+        node = self
+        while node is not None and node._summary is not None:
+            node._summary = None
+            node._lca_index = None
+            node = node.parent
+
+    def summary(self):
+        """(tip count, taxon mask, has duplicated taxa) for this subtree"""
+        if self._summary is None:
+            nodes = []
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                if node._summary is None:
+                    nodes.append(node)
+                    stack.extend(node.children)
+            for node in reversed(nodes):  # children before their parents
+                if node.istip:
+                    bit = taxon_bit(taxon_name(node.label))
+                    node._summary = (1, 1 << bit, False)
+                else:
+                    tips, mask, dups = 0, 0, False
+                    for child in node.children:
+                        child_tips, child_mask, child_dups = child._summary
+                        tips += child_tips
+                        dups = dups or child_dups or bool(mask & child_mask)
+                        mask |= child_mask
+                    node._summary = (tips, mask, dups)
+        return self._summary
+
+    def lca_index(self):
+        """
+        the LCAIndex of this subtree, built on first use. the summaries are
+        cached too so that an edit anywhere below clears the index
+        """
+        if self._lca_index is None:
+            self.summary()
+            self._lca_index = LCAIndex(self)
+        return self._lca_index
+
+    def tip_count(self):
+        return self.summary()[0]
+
+    def taxon_mask(self):
+        return self.summary()[1]
+
+    def taxon_count(self):
+        return bin(self.summary()[1]).count("1")
+
+    def has_duplicates(self):
+        return self.summary()[2]
+
+    def taxa(self):
+        """the set of taxon IDs under this node"""
+        return taxon_names(self.summary()[1])
 
     def leaves(self):
         return [n for n in self.iternodes() if n.istip]
 
     def iternodes(self, order=POSTORDER):
         """
-        returns a list of nodes descendant from self - including self
+        returns a list of nodes descendant from self - including self.
+        uses an explicit stack so deep trees don't hit the recursion limit
         """
         if order == PREORDER:
-            yield self
-        for child in self.children:
-            for d in child.iternodes(order):
-                yield d
-        if order == POSTORDER:
-            yield self
+            stack = [self]
+            while stack:
+                node = stack.pop()
+                yield node
+                stack.extend(reversed(node.children))
+        elif order == POSTORDER:
+            stack = [(self, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if expanded or not node.children:
+                    yield node
+                else:
+                    stack.append((node, True))
+                    stack.extend((c, False) for c in reversed(node.children))
 
     def descendants(self, order=PREORDER, v=None):
         """
@@ -64,23 +229,18 @@ class Node:
         if v is None:
             v = []
         assert order in (PREORDER, POSTORDER)
-        for child in self.children:
-            if order == PREORDER:
-                v.append(child)
-            else:
-                v.insert(0, child)
-            if child.children:
-                child.descendants(order, v)
+        nodes = self.iternodes(PREORDER)
+        next(nodes)  # skip self
+        if order == PREORDER:
+            v.extend(nodes)
+        else:
+            v[0:0] = reversed(list(nodes))
         return v
 
     def find_descendant(self, label):
-        if label == self.label:
-            return self
-        else:
-            for child in self.children:
-                n = child.find_descendant(label)
-                if n:
-                    return n
+        for node in self.iternodes(PREORDER):
+            if label == node.label:
+                return node
         return None
 
     def prune(self):
@@ -104,25 +264,25 @@ class Node:
         """
         if store is None:
             store = {}
-        leaf2len = {}
-        if self.children:
-            for child in self.children:
-                if measure == BRANCHLENGTH:
-                    assert child.length is not None
-                    dist = child.length
-                elif measure == INTERNODES:
-                    dist = 1
-                else:
-                    raise Exception("InvalidMeasure")
-                child.leaf_distances(store, measure)
-                if child.istip:
-                    leaf2len[child.label] = dist
-                else:
-                    for k, v in store[child].items():
-                        leaf2len[k] = v + dist
-        else:
-            leaf2len[self] = {self.label: 0}
-        store[self] = leaf2len
+        for node in self.iternodes(POSTORDER):
+            leaf2len = {}
+            if node.children:
+                for child in node.children:
+                    if measure == BRANCHLENGTH:
+                        assert child.length is not None
+                        dist = child.length
+                    elif measure == INTERNODES:
+                        dist = 1
+                    else:
+                        raise Exception("InvalidMeasure")
+                    if child.istip:
+                        leaf2len[child.label] = dist
+                    else:
+                        for k, v in store[child].items():
+                            leaf2len[k] = v + dist
+            else:
+                leaf2len[node] = {node.label: 0}
+            store[node] = leaf2len
         return store
 
     def rootpath(self):
@@ -216,15 +376,51 @@ def node2size(node, d=None):
     """map node and descendants to number of descendant tips"""
     if d is None:
         d = {}
-    size = int(node.istip)
-    if not node.istip:
-        for child in node.children:
-            node2size(child, d)
-            size += d[child]
-    d[node] = size
+    nodes = []
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        nodes.append(n)
+        if not n.istip:
+            stack.extend(n.children)
+    for n in reversed(nodes):  # children before their parents
+        size = int(n.istip)
+        if not n.istip:
+            for child in n.children:
+                size += d[child]
+        d[n] = size
     return d
 
 
+def combine_summaries(summary1, summary2):
+    """the summary of the tips in two disjoint groups"""
+    tips1, mask1, dups1 = summary1
+    tips2, mask2, dups2 = summary2
+    return (tips1 + tips2, mask1 | mask2,
+            dups1 or dups2 or bool(mask1 & mask2))
+
+
+def back_summaries(root):
+    """
+    map every node to the summary of the tips that are not under it. a
+    node's back is its parent's back plus its sisters, so one preorder
+    pass over the cached summaries finds them all
+    """
+    empty = (0, 0, False)
+    root.summary()
+    backs = {root: empty}
+    for node in root.iternodes(PREORDER):
+        children = node.children
+        after = [empty]  # after[-i - 1]: the children after the i-th one
+        for child in reversed(children[1:]):
+            after.append(combine_summaries(child.summary(), after[-1]))
+        before = backs[node]
+        for child in children:
+            backs[child] = combine_summaries(before, after.pop())
+            before = combine_summaries(before, child.summary())
+    return backs
+
+
 def reroot(oldroot, newroot):
     oldroot.isroot = False
     newroot.isroot = True
@@ -246,59 +442,90 @@ def reroot(oldroot, newroot):
     return newroot
 
 
+class LCAIndex:
+    """
+    answers last common ancestor queries in constant time. it is built
+    once per tree from an Euler tour and a sparse table of the shallowest
+    node in each power-of-two stretch of the tour. Node.lca_index keeps
+    one until the tree is edited
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.tour = []  # nodes in Euler tour order
+        self.first = {}  # node -> its first position in the tour
+        self.tips = {}  # label -> tip nodes
+
+        codes = []  # depth and tour position packed into one int
+        stack = [(root, 0)]  # node, next child to visit
+        while stack:
+            node, i = stack[-1]
+            if i == 0:
+                self.first[node] = len(self.tour)
+                if node.istip:
+                    self.tips.setdefault(node.label, []).append(node)
+            codes.append(len(stack) - 1)
+            self.tour.append(node)
+            if i < len(node.children):
+                stack[-1] = (node, i + 1)
+                stack.append((node.children[i], 0))
+            else:
+                stack.pop()
+
+        # the min of two codes is the shallower node, ties go to the left
+        self.shift = len(codes).bit_length()
+        self.mask = (1 << self.shift) - 1
+        level = [(d << self.shift) | i for i, d in enumerate(codes)]
+        self.table = [level]
+        width = 1
+        while 2 * width <= len(codes):
+            level = list(map(min, level, level[width:]))
+            self.table.append(level)
+            width *= 2
+
+    def _shallowest(self, lo, hi):
+        """the shallowest node in tour positions lo to hi inclusive"""
+        k = (hi - lo + 1).bit_length() - 1
+        level = self.table[k]
+        code = min(level[lo], level[hi - (1 << k) + 1])
+        return self.tour[code & self.mask]
+
+    def lca(self, node1, node2):
+        """the last common ancestor of two nodes"""
+        pos1, pos2 = self.first[node1], self.first[node2]
+        if pos1 > pos2:
+            pos1, pos2 = pos2, pos1
+        return self._shallowest(pos1, pos2)
+
+    def mrca(self, nodes):
+        """
+        the most recent common ancestor of a group of nodes. it is the
+        last common ancestor of the first and last of them in the tour
+        """
+        positions = [self.first[n] for n in nodes]
+        if not positions:
+            return None
+        return self._shallowest(min(positions), max(positions))
+
+    def mrca_of_labels(self, labels):
+        """the most recent common ancestor of the tips with these labels"""
+        return self.mrca(
+            [tip for label in labels for tip in self.tips.get(label, [])])
+
+
 def getMRCA(innames, tree):
     if len(innames) == 1:
         return None
-    else:
-        outgroup = []
-        for name in innames:
-            for i in range(len(tree.leaves())):
-                if tree.leaves()[i].label == name:
-                    outgroup.append(tree.leaves()[i])
-        cur1 = outgroup.pop()
-        while len(outgroup) > 0:
-            cur2 = outgroup.pop()
-            tempmrca = getMRCATraverse(cur1, cur2)
-            cur1 = tempmrca
-        mrca = cur1
-    return mrca
+    return tree.lca_index().mrca_of_labels(innames)
 
 
 def getMRCATraverse(curn1, curn2):
-    mrca = None
-    # get path to root for first node
-    path1 = []
-    parent = curn1
-    path1.append(parent)
-    while parent is not None:
-        path1.append(parent)
-        if parent.parent is not None:
-            parent = parent.parent
-        else:
-            break
-    # find first match between this node and the first one
-    parent = curn2
-    x = True
-    while x:
-        for i in range(len(path1)):
-            if parent == path1[i]:
-                mrca = parent
-                x = False
-                break
-        parent = parent.parent
-    return mrca
+    return getMRCATraverseFromPath(list(curn1.rootpath()), curn2)
 
 
 def getMRCATraverseFromPath(path1, curn2):
-    mrca = None
-    # find first match between this node and the first one
-    parent = curn2
-    x = True
-    while x:
-        for i in range(len(path1)):
-            if parent == path1[i]:
-                mrca = parent
-                x = False
-                break
-        parent = parent.parent
-    return mrca
+    path1 = set(path1)
+    for node in curn2.rootpath():
+        if node in path1:
+            return node
+    return None
@@ -8,10 +8,16 @@ import pylib.bio as bio
 def check(args):
     """Check the input files for good data."""
     for fasta in args.input_files:
-        logging.info('check input: {}'.format(fasta))
-        duplicate_names(fasta)
-        too_few_records(fasta)
-        seq_too_long(fasta, args.seq_type)
+        check_fasta(args, fasta)
+
+
+def check_fasta(args, fasta):
+    """Check one fasta file. Return False if it is too small for a tree."""
+    logging.info('check input: {}'.format(fasta))
+    duplicate_names(fasta)
+    too_few = too_few_records(fasta)
+    seq_too_long(fasta, args.seq_type)
+    return not too_few
 
 
 def duplicate_names(fasta):
@@ -32,6 +38,8 @@ def too_few_records(fasta):
     if bio.fasta_record_count(fasta) < bio.MIN_SEQ:
         logging.warning('{} has fewer than {} records, skipping.'.format(
             fasta, bio.MIN_SEQ))
+        return True
+    return False
 
 
 def seq_too_long(fasta, seq_type):
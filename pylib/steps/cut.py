@@ -1,24 +1,25 @@
 """Cut long internal branches."""
 
 import logging
-from pylib import util
+from pylib.manifest import resumable
 from pylib.wrappers.cut_branches import cut_branches
 
 
 def cut(args):
     """Cut long internal branches."""
     for tree in args.input_files:
-        logging.info('cut_branches input: {}'.format(tree))
+        cut_tree(args, tree)
 
-        count = util.count_tree_taxa(tree)
-        if count < args.min_taxa:
-            logging.info(
-                '"{}" skipped, it has only {} of {} taxa.'.format(
-                    tree, count, args.min_taxa))
-            continue
 
-        cut_tree, enough_taxa = cut_branches(
-            tree, args.output_dir, args.output_ext,
-            args.branch_cutoff, args.min_taxa)
-
-        logging.info('cut_branches output: {}'.format(cut_tree))
+@resumable('cut', params=('output_ext', 'branch_cutoff', 'min_taxa'))
+def cut_tree(args, tree):
+    """Cut the long internal branches in one tree."""
+    logging.info('cut_branches input: {}'.format(tree))
+    subtrees = cut_branches(
+        tree, args.output_dir, args.output_ext,
+        args.branch_cutoff, args.min_taxa)
+    if not subtrees:
+        logging.info('"{}" has no subtrees with at least {} taxa.'.format(
+            tree, args.min_taxa))
+    logging.info('cut_branches output: {}'.format(subtrees))
+    return subtrees
@@ -1,8 +1,16 @@
 """Build homology trees."""
 
 from os.path import abspath
+from copy import copy
+from functools import partial
 import logging
 import pylib.bio as bio
+from pylib import jobs
+from pylib import cache
+from pylib import engine
+from pylib import memory
+from pylib.failures import run_with_retries
+from pylib.manifest import resumable
 from pylib.wrappers.mafft import mafft
 from pylib.wrappers.raxml import raxml, raxml_bs
 from pylib.wrappers.phyx import pxclsq
@@ -10,67 +18,156 @@ from pylib.wrappers.pasta import pasta
 from pylib.wrappers.fasttree import fasttree
 
 
+# Argument changes for each retry of a failed gene
+ESCALATIONS = [
+    {'anysymbol': True},
+    {'anysymbol': True, 'simple_tree': True},
+]
+
+
 def fa2tree(args):
     """Build trees from the fasta data."""
-    for fasta in args.input_files:
-        logging.info('fa2tree input: {}'.format(fasta))
-        fasta = abspath(fasta)
-        if args.bootstrap:
-            fa2tree_bs(args, fasta)
-        elif bio.fasta_record_count(fasta) >= bio.SEQ_COUNT_CUTOFF:
-            fa2tree_big(args, fasta)
-        else:
-            fa2tree_default(args, fasta)
+    if args.engine == 'asyncio':
+        run_with_retries(fa2tree_async, args, args.input_files, ESCALATIONS)
+    else:
+        run_with_retries(fa2tree_pool, args, args.input_files, ESCALATIONS)
+
+
+def fa2tree_pool(args, paths):
+    """Build the trees in a pool of processes."""
+    return jobs.run_jobs(
+        fa2tree_gene, args, paths, cost=gene_cost,
+        size=partial(gene_size, args.seq_type))
+
+
+def fa2tree_async(args, paths):
+    """Build the trees with all of the programs run from one process."""
+    limit, threads = jobs.split_cpus(args.cpus, args.jobs)
+    args = copy(args)
+    args.cpus = threads
+    paths = sorted(paths, key=gene_cost, reverse=True)
+    logging.info('running up to {} programs with {} CPUs each'.format(
+        limit, threads))
+    return engine.Engine(limit, max_mem=memory.budget(args.max_mem)).map(
+        fa2tree_gene, args, paths)
+
+
+def gene_cost(fasta):
+    """Estimate the relative cost of building a tree from the fasta file.
+
+    Aligning dominates and it grows with the square of the number of
+    sequences and with the sequence length.
+    """
+    count = bio.fasta_record_count(fasta)
+    longest = bio.longest_fasta_seq(fasta)
+    return count * count * longest
+
+
+def gene_size(seq_type, fasta):
+    """The (kind, cells) for estimating the memory to build a tree.
+
+    Big genes are aligned with PASTA, the rest use RAxML.
+    """
+    count = bio.fasta_record_count(fasta)
+    program = 'pasta' if count >= bio.SEQ_COUNT_CUTOFF else 'raxml'
+    return memory.kind(program, seq_type), count * bio.longest_fasta_seq(fasta)
+
+
+@engine.tool
+@resumable('fa2tree',
+           params=('output_ext', 'seq_type', 'bootstrap', 'anysymbol',
+                   'min_occupancy', 'min_seq_len', 'seed', 'simple_tree'),
+           tools=('mafft', 'pxclsq', 'raxml', 'run_pasta.py', 'fasttree'))
+def fa2tree_gene(args, fasta):
+    """Build a tree from one fasta file."""
+    cache.setup(args.cache_dir, args.cache_size)
+    logging.info('fa2tree input: {}'.format(fasta))
+    fasta = abspath(fasta)
+    if args.bootstrap:
+        return (yield from fa2tree_bs(args, fasta))
+    if bio.fasta_record_count(fasta) >= bio.SEQ_COUNT_CUTOFF:
+        return (yield from fa2tree_big(args, fasta))
+    return (yield from fa2tree_default(args, fasta))
 
 
 def fa2tree_bs(args, fasta):
     """Build trees from the fasta data, bootstrap version."""
     logging.info('mafft started')
-    aligned = mafft(fasta, args.output_dir, args.output_ext, args.seq_type,
-                    args.cpus, args.anysymbol)
+    aligned = yield from engine.steps(
+        mafft, fasta, args.output_dir, args.output_ext, args.seq_type,
+        args.cpus, args.anysymbol)
     logging.info('mafft output: {}'.format(aligned))
 
     logging.info('pxclsq started')
-    cleaned = pxclsq(aligned, args.output_dir, args.output_ext, args.seq_type,
-                     args.min_occupancy, args.min_seq_len)
+    cleaned = yield from engine.steps(
+        pxclsq, aligned, args.output_dir, args.output_ext, args.seq_type,
+        args.min_occupancy, args.min_seq_len)
     logging.info('pxclsq output: {}'.format(cleaned))
 
+    if getattr(args, 'simple_tree', False):
+        return (yield from simple_tree(args, cleaned))
+
     logging.info('raxml_bs started')
-    tree = raxml_bs(cleaned, args.output_dir, args.output_ext, args.seq_type,
-                    args.cpus, args.seed)
+    tree = yield from engine.steps(
+        raxml_bs, cleaned, args.output_dir, args.output_ext, args.seq_type,
+        args.cpus, args.seed)
     logging.info('raxml_bs output: {}'.format(tree))
 
+    return tree
+
 
 def fa2tree_big(args, fasta):
     """Build trees from the fasta data, large file version."""
     logging.info('pasta started')
-    aligned = pasta(fasta, args.output_dir, args.output_ext, args.seq_type,
-                    args.cpus)
+    aligned = yield from engine.steps(
+        pasta, fasta, args.output_dir, args.output_ext, args.seq_type,
+        args.cpus)
     logging.info('pasta output: {}'.format(aligned))
 
     logging.info('pxclsq started')
-    cleaned = pxclsq(aligned, args.output_dir, args.output_ext, args.seq_type,
-                     args.min_occupancy, args.min_seq_len)
+    cleaned = yield from engine.steps(
+        pxclsq, aligned, args.output_dir, args.output_ext, args.seq_type,
+        args.min_occupancy, args.min_seq_len)
     logging.info('pxclsq output: {}'.format(cleaned))
 
     logging.info('fasttree started')
-    tree = fasttree(cleaned, args.output_dir, args.output_ext, args.seq_type)
+    tree = yield from engine.steps(
+        fasttree, cleaned, args.output_dir, args.output_ext, args.seq_type)
     logging.info('fasttree output: {}'.format(tree))
 
+    return tree
+
 
 def fa2tree_default(args, fasta):
     """Build trees from the fasta data, normal version."""
     logging.info('mafft started')
-    aligned = mafft(fasta, args.output_dir, args.output_ext, args.seq_type,
-                    args.cpus, args.anysymbol)
+    aligned = yield from engine.steps(
+        mafft, fasta, args.output_dir, args.output_ext, args.seq_type,
+        args.cpus, args.anysymbol)
     logging.info('mafft output: {}'.format(aligned))
 
     logging.info('pxclsq started')
-    cleaned = pxclsq(aligned, args.output_dir, args.output_ext, args.seq_type,
-                     args.min_occupancy, args.min_seq_len)
+    cleaned = yield from engine.steps(
+        pxclsq, aligned, args.output_dir, args.output_ext, args.seq_type,
+        args.min_occupancy, args.min_seq_len)
     logging.info('pxclsq output: {}'.format(cleaned))
 
+    if getattr(args, 'simple_tree', False):
+        return (yield from simple_tree(args, cleaned))
+
     logging.info('raxml started')
-    tree = raxml(cleaned, args.output_dir, args.output_ext, args.seq_type,
-                 args.cpus, args.seed)
+    tree = yield from engine.steps(
+        raxml, cleaned, args.output_dir, args.output_ext, args.seq_type,
+        args.cpus, args.seed)
     logging.info('raxml output: {}'.format(tree))
+
+    return tree
+
+
+def simple_tree(args, cleaned):
+    """Use fasttree in place of raxml when retrying a failed gene."""
+    logging.info('fasttree started')
+    tree = yield from engine.steps(
+        fasttree, cleaned, args.output_dir, args.output_ext, args.seq_type)
+    logging.info('fasttree output: {}'.format(tree))
+    return tree
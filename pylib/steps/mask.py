@@ -1,12 +1,22 @@
 """Build homology trees."""
 
 import logging
+from pylib.manifest import resumable
 from pylib.wrappers.mask_tips import mask_tips
 
 
 def mask(args):
     """Mask monophyletic tree tips that belong to the same taxon."""
     for tree in args.input_files:
-        logging.info('mask_tips input: {}'.format(tree))
-        masked = mask_tips(tree, args.output_dir, args.output_ext)
-        logging.info('mask_tips output: {}'.format(masked))
+        mask_tree(args, tree)
+
+
+@resumable('mask', params=('output_ext', 'binary_trees'))
+def mask_tree(args, tree):
+    """Mask monophyletic tips in one tree."""
+    logging.info('mask_tips input: {}'.format(tree))
+    masked = mask_tips(
+        tree, args.output_dir, args.output_ext,
+        getattr(args, 'binary_trees', False))
+    logging.info('mask_tips output: {}'.format(masked))
+    return masked
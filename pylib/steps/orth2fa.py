@@ -1,143 +1,71 @@
-"""Build homology trees."""
+"""Write ortholog trees to fasta files."""
 
+import re
+import sys
 import logging
-import pylib.util as util
-import pylib.bio as bio
-# from pylib.mafft import mafft
-# from pylib.raxml import raxml, raxml_bs
-# from pylib.phyx import pxclsq, pxrr
-# from pylib.pasta import pasta
-# from pylib.fasttree import fasttree
-# from pylib.treeshrink import treeshrink
-# from pylib.tree_to_fasta import tree_to_fasta, ortholog_to_fasta
-# from oldlib.mask_tips import mask_tips
-# from oldlib.prune_paralogs_mi import prune_mi
-# from oldlib.prune_paralogs_mo import prune_mo
-# from oldlib.prune_paralogs_rt import prune_rt
-# from oldlib.prune_orthologs_1to1 import prune_1to1
-
-
-def check_input(args):
-    """Check the input files for good data."""
-    for in_file in args.input_files:
-        logging.info('Checking fasta "{}"'.format(in_file))
-        too_few_records(in_file)
-        seq_too_long(in_file, args.seq_type)
-
-
-def too_few_records(fasta):
-    """Check if the fasta file is too small to make a good tree."""
-    if bio.fasta_record_count(fasta) < bio.MIN_SEQ:
-        logging.warning('"{}" has fewer than {} records, skipping.'.format(
-            fasta, bio.MIN_SEQ))
-
-
-def seq_too_long(fasta, seq_type):
-    """Warn about really long sequences."""
-    longest = bio.longest_fasta_seq(fasta)
-
-    if bio.seqs_too_long(longest, seq_type):
-        seq_count = bio.fasta_record_count(fasta)
-        logging.warning(util.shorten("""{} has {} sequences.
-            The longest is {} characters.
-            This is too long and may crash the alignment process.
-            """.format(fasta, seq_count, longest)))
-
-
-def fasta_to_tree(args):
-    """Build trees from the fasta data."""
-
-    for fasta in util.get_input_files(args.input_dir, args.input_filter):
-        if args.bootstrap:
-            fasta_to_tree_bs(args, fasta)
-        elif bio.fasta_record_count(fasta) >= bio.SEQ_COUNT_CUTOFF:
-            pass
-        else:
-            aligned = mafft(
-                fasta, args.output_dir, args.seq_type, args.cpus,
-                args.anysymbol)
-            cleaned = pxclsq(
-                aligned, args.output_dir, args.seq_type, args.min_occupancy,
-                args.min_seq_len)
-            raxml(
-                cleaned, args.output_dir, args.seq_type, args.cpus, args.seed)
-
-
-def fasta_to_tree_bs(args, fasta):
-    """Build trees from the fasta data, bootstrap version."""
-
-    aligned = mafft(
-        fasta, args.output_dir, args.seq_type, args.cpus, args.anysymbol)
-
-    cleaned = pxclsq(
-        aligned, args.output_dir, args.seq_type, args.min_occupancy,
-        args.min_seq_len)
-
-    raxml_bs(cleaned, args.output_dir, args.seq_type, args.cpus, args.seed)
-
-
-def fasta_to_tree_big(args, fasta):
-    """Build trees from the fasta data, large file version."""
-    aligned = pasta(fasta, args.output_dir, args.seq_type)
-
-    cleaned = pxclsq(
-        aligned, args.output_dir, args.seq_type, args.min_occupancy,
-        args.min_seq_len)
-
-    fasttree(cleaned, args.output_dir, args.seq_type)
-
-
-def fasta_to_tree_normal(args, fasta):
-    """Build trees from the fasta data, normal version."""
-
-
-def tree_shrink(data, args):
-    """Remove long branches from trees."""
-    logging.info('Shrinking tree for {}'.format(args.log_name))
-
-    trimmed = treeshrink(
-        tree, args.output_dir, args.quantiles)
-    pxrr(trimmed, args.output_dir)
-
-
-def mask_tree(data, args):
-    """Mask mono- and paraphyletic-tips that belong to the same taxon."""
-    logging.info('Masking tree tips for {}'.format(args.log_name))
-
-    mask_tips(cleaned, unrooted, args.output_dir, args.mask_paraphyletic)
-
-
-def new_fasta(data, args):
-    """Mask mono- and paraphyletic-tips that belong to the same taxon."""
-    logging.info(
-        'Converting masked tree to fasta for {}'.format(args.log_name))
-
-    tree_to_fasta(fasta, masked, args.output_dir)
-
-
-def prune_paralogs(data, args):
-    """Prune paralogs."""
-    logging.info('Pruning paralogs for {}'.format(args.log_name))
-
-    if args.prune == 'mi':
-        prune_mi(
-            masked, args.output_dir, args.min_taxa,
-            args.relative_tip_cutoff, args.absolute_tip_cutoff)
-    elif args.prune == 'mo':
-        prune_mo(masked, args.output_dir, args.min_taxa, args.out_groups)
-    elif args.prune == 'rt':
-        prune_rt(
-            masked, args.output_dir, args.min_taxa,
-            args.taxon_code_file)
+from os.path import basename, splitext
+from pylib import util
+from pylib.manifest import resumable
+from pylib.wrappers.tree_to_fasta import ortholog_to_fasta
+
+# The suffixes the pruners add to the gene's name: MO's ".ortho", RT's
+# ".ortho<n>" and ".unrooted-ortho", MI's "_MIortho<n>", and "_1to1ortho".
+# Trees from a file with several trees also have ".tree<n>" in their names.
+ORTHO_SUFFIX = re.compile(
+    r'(\.tree\d+)?(\.ortho\d*|\.unrooted-ortho|_MIortho\d+|_1to1ortho)'
+    r'\.tre$')
+
+
+def orth2fa(args):
+    """Write the sequences for each ortholog tree to a fasta file.
+
+    Each tree is matched to the fasta file for its gene by the file names.
+    """
+    for fasta, tree in pair_by_gene(args.fasta_files, args.tree_files):
+        ortho_fasta(args, fasta, tree)
+
+
+def pair_by_gene(fasta_files, tree_files):
+    """Match each tree file to the fasta file for its gene.
+
+    Exit if a tree has no fasta file or if two fasta files are for the
+    same gene. Fasta files without a tree are left out.
+    """
+    fastas = {}
+    for fasta in fasta_files:
+        stem = gene_stem(fasta)
+        if stem in fastas:
+            sys.exit(util.shorten("""The fasta files "{}" and "{}" are both
+                for the gene "{}".""".format(fastas[stem], fasta, stem)))
+        fastas[stem] = fasta
+
+    pairs = []
+    for tree in tree_files:
+        stem = gene_stem(tree)
+        if stem not in fastas:
+            sys.exit(util.shorten("""There is no fasta file for "{}". Its
+                gene is "{}" so it needs a fasta file like
+                "{}.fasta".""".format(tree, stem, stem)))
+        pairs.append((fastas[stem], tree))
+    return pairs
+
+
+def gene_stem(path):
+    """Get the gene's name from a fasta file or ortholog tree file name."""
+    name = basename(path)
+    stem = ORTHO_SUFFIX.sub('', name)
+    return stem if stem != name else splitext(name)[0]
+
+
+@resumable('orth2fa', params=('output_ext', 'min_taxa'))
+def ortho_fasta(args, fasta, tree):
+    """Write the sequences for one ortholog tree to a fasta file."""
+    logging.info('orth2fa input: {}'.format(tree))
+    new_fasta = ortholog_to_fasta(
+        fasta, tree, args.output_dir, args.min_taxa, args.output_ext)
+    if new_fasta:
+        logging.info('ortholog_to_fasta output: {}'.format(new_fasta))
     else:
-        prune_1to1(masked, args.output_dir, args.min_taxa)
-
-
-def orthologs_to_fasta(data, args):
-    """Write ortholog trees to fasta files."""
-    ortho_fa = []
-    for tree_file in orthos:
-        fasta = ortholog_to_fasta(
-            fasta2, tree_file, args.output_dir, args.min_taxa)
-        if fasta:
-            ortho_fa.append_(fasta)
+        logging.info('"{}" skipped, it has fewer than {} taxa.'.format(
+            tree, args.min_taxa))
+    return new_fasta
@@ -0,0 +1,85 @@
+"""Move each gene through all of the steps on its own."""
+
+from os.path import basename, join
+from copy import copy
+from functools import partial
+import logging
+from pylib import jobs
+from pylib.steps.check import check_fasta
+from pylib.failures import run_with_retries
+from pylib.steps.fa2tree import (
+    ESCALATIONS, fa2tree_gene, gene_cost, gene_size)
+from pylib.steps.shrink import shrink_tree
+from pylib.steps.mask import mask_tree
+from pylib.steps.tree2fa import tree_fasta
+from pylib.steps.prune import prune_tree
+from pylib.steps.orth2fa import ortho_fasta
+
+EXT_FA2TREE = '.tre'
+EXT_SHRINK = '.tt'
+EXT_MASK = '.mm'
+EXT_FASTA = '.fa'
+
+
+def run(args):
+    """Run all of the steps for each gene as soon as the gene is ready.
+
+    A gene does not wait for the other genes to finish a step before it
+    moves on to its next step.
+    """
+    run_with_retries(run_pool, args, args.input_files, ESCALATIONS)
+
+
+def run_pool(args, paths):
+    """Run the genes in a pool of processes."""
+    return jobs.run_jobs(
+        run_gene, args, paths, cost=gene_cost,
+        size=partial(gene_size, args.seq_type))
+
+
+def run_gene(args, fasta):
+    """Move one gene through all of the steps."""
+    if not check_fasta(args, fasta):
+        return []
+
+    tree = fa2tree_gene(step_args(args, EXT_FA2TREE), fasta)
+    tree = output_path(args, tree)
+
+    unrooted = shrink_tree(step_args(args, EXT_SHRINK), tree)
+    unrooted = output_path(args, unrooted)
+
+    masked = mask_tree(step_args(args, EXT_MASK), unrooted)
+    masked = output_path(args, masked)
+
+    new_fasta = tree_fasta(step_args(args, EXT_FASTA), fasta, masked)
+
+    if not args.prune:
+        logging.info('run output: {}'.format(new_fasta))
+        return [new_fasta]
+
+    orthologs = prune_tree(args, masked)
+
+    ortho_fastas = []
+    for ortholog in orthologs:
+        # The pruners also return their rerooted and in-group clade trees
+        if 'ortho' not in basename(ortholog):
+            continue
+        ortho = ortho_fasta(step_args(args, EXT_FASTA), fasta, ortholog)
+        if ortho:
+            ortho_fastas.append(ortho)
+
+    logging.info('run output: {} ortholog fasta files for {}'.format(
+        len(ortho_fastas), fasta))
+    return ortho_fastas
+
+
+def step_args(args, output_ext):
+    """Get the arguments for a step with its output extension."""
+    args = copy(args)
+    args.output_ext = output_ext
+    return args
+
+
+def output_path(args, file_name):
+    """Wrappers return file names relative to the output directory."""
+    return join(args.output_dir, basename(file_name))
@@ -2,6 +2,7 @@
 
 from os.path import abspath
 import logging
+from pylib.manifest import resumable
 from pylib.wrappers.phyx import pxrr
 from pylib.wrappers.treeshrink import treeshrink
 
@@ -9,15 +10,24 @@ from pylib.wrappers.treeshrink import treeshrink
 def shrink(args):
     """Remove long branches from trees."""
     for tree in args.input_files:
-        logging.info('shrink input: {}'.format(tree))
+        shrink_tree(args, tree)
 
-        tree = abspath(tree)
 
-        logging.info('treeshrink started')
-        trimmed = treeshrink(tree, args.output_dir, args.output_ext,
-                             args.quantiles)
-        logging.info('treeshrink output: {}'.format(trimmed))
+@resumable('shrink', params=('output_ext', 'quantiles'),
+           tools=('run_treeshrink.py', 'pxrr'))
+def shrink_tree(args, tree):
+    """Remove long branches from one tree."""
+    logging.info('shrink input: {}'.format(tree))
 
-        logging.info('pxrr started')
-        unrooted = pxrr(trimmed, args.output_dir)
-        logging.info('pxrr output: {}'.format(unrooted))
+    tree = abspath(tree)
+
+    logging.info('treeshrink started')
+    trimmed = treeshrink(tree, args.output_dir, args.output_ext,
+                         args.quantiles)
+    logging.info('treeshrink output: {}'.format(trimmed))
+
+    logging.info('pxrr started')
+    unrooted = pxrr(trimmed, args.output_dir)
+    logging.info('pxrr output: {}'.format(unrooted))
+
+    return unrooted
@@ -1,16 +1,25 @@
 """Build homology trees."""
 
 import logging
+from pylib.manifest import resumable
+from pylib.steps.orth2fa import pair_by_gene
 from pylib.wrappers.tree_to_fasta import tree_to_fasta
 
 
 def tree2fa(args):
-    """Mask mono- and paraphyletic-tips that belong to the same taxon."""
-    trees = args.tree_files
-    masks = args.mask_files
+    """Write the sequences for the tips of each tree to a fasta file.
 
-    for fasta, tree in zip(masks, trees):
-        logging.info('tree2fa input: {}'.format(tree))
-        new_fasta = tree_to_fasta(
-            fasta, tree, args.output_dir, args.output_ext)
-        logging.info('tree_to_fasta output: {}'.format(new_fasta))
+    Each tree is matched to the fasta file for its gene by the file names.
+    """
+    for fasta, tree in pair_by_gene(args.mask_files, args.tree_files):
+        tree_fasta(args, fasta, tree)
+
+
+@resumable('tree2fa', params=('output_ext',))
+def tree_fasta(args, fasta, tree):
+    """Write the sequences for the tips in the tree to a fasta file."""
+    logging.info('tree2fa input: {}'.format(tree))
+    new_fasta = tree_to_fasta(
+        fasta, tree, args.output_dir, args.output_ext)
+    logging.info('tree_to_fasta output: {}'.format(new_fasta))
+    return new_fasta
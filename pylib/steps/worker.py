@@ -0,0 +1,110 @@
+"""Take genes from the work queue and run a step on them."""
+
+import os
+import socket
+import logging
+import threading
+from argparse import Namespace
+from os.path import abspath
+from pylib import engine
+from pylib.work_queue import WorkQueue, RUNNING
+from pylib.steps.fa2tree import fa2tree_gene
+from pylib.steps.shrink import shrink_tree
+from pylib.steps.mask import mask_tree
+from pylib.steps.prune import prune_tree
+from pylib.steps.run import run_gene
+
+STEPS = {
+    'fa2tree': fa2tree_gene,
+    'shrink': shrink_tree,
+    'mask': mask_tree,
+    'prune': prune_tree,
+    'run': run_gene,
+}
+
+WAIT = 30  # Seconds between checks for expired leases
+
+
+def enqueue(args):
+    """Load the input files into the work queue for the workers."""
+    step = args.func.__name__
+    paths = [abspath(p) for p in args.input_files]
+
+    saved = {k: v for k, v in vars(args).items()
+             if k not in ('func', 'enqueue') and not k.startswith('default_')}
+    saved['output_dir'] = abspath(args.output_dir)
+    saved['input_files'] = paths
+
+    queue = WorkQueue(args.output_dir)
+    queue.load(step, saved, paths)
+    queue.close()
+
+    logging.info('{} input files for {} are in the queue {}'.format(
+        len(paths), step, queue.path))
+
+
+def worker(args):
+    """Run genes from the queue until they are all done."""
+    name = '{}:{}'.format(socket.gethostname(), os.getpid())
+
+    queue = WorkQueue(args.output_dir)
+    step, saved = queue.settings()
+    func = STEPS[step]
+
+    step_args = Namespace(**saved)
+    step_args.cpus = args.cpus
+    step_args.jobs = 1
+
+    logging.info('worker {} started on {}'.format(name, step))
+
+    while True:
+        path = queue.claim(name, args.lease)
+
+        if not path:
+            if queue.counts().get(RUNNING):
+                threading.Event().wait(WAIT)  # Other workers may die
+                continue
+            break
+
+        with Heartbeat(args.output_dir, path, name, args.lease):
+            try:
+                with engine.time_limit(getattr(step_args, 'timeout', None)):
+                    func(step_args, path)
+            except Exception as err:  # pylint: disable=broad-except
+                logging.exception('{} failed: {}'.format(step, path))
+                queue.finish(path, name, error=repr(err))
+                continue
+
+        queue.finish(path, name)
+
+    logging.info('worker {} finished: {}'.format(name, queue.counts()))
+    queue.close()
+
+
+class Heartbeat:
+    """Keep renewing the lease on a gene while we work on it."""
+
+    def __init__(self, output_dir, path, name, lease):
+        self.output_dir = output_dir
+        self.path = path
+        self.name = name
+        self.lease = lease
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.beat, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+
+    def beat(self):
+        """Renew the lease a few times per lease period."""
+        queue = WorkQueue(self.output_dir)
+        try:
+            while not self.stop.wait(self.lease / 4):
+                queue.renew(self.path, self.name, self.lease)
+        finally:
+            queue.close()
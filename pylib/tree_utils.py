@@ -1,5 +1,8 @@
 import pylib.phylo3 as phylo3
-import sys
+import pylib.newick3 as newick3
+import pylib.binary_trees as binary_trees
+from os.path import splitext
+from shutil import copyfile
 
 
 def get_name(label):
@@ -11,6 +14,42 @@ def get_cluster_id(filename):
     return filename.split(".")[0]
 
 
+def read_trees(tree_file):
+    """read the trees in a file one at a time, yield (tree, name, source).
+    output files are named after name, it is the file name with .tree<n>
+    added when the file holds more than one tree. source is the file if it
+    holds just this tree, so it can be copied as is"""
+    trees = newick3.trees_from_file(tree_file)
+    tree, following = next(trees, None), next(trees, None)
+    if following is None:
+        if tree is not None:
+            yield tree, tree_file, tree_file
+        return
+    root, ext = splitext(tree_file)
+    number = 1
+    while tree is not None:
+        yield tree, '{}.tree{}{}'.format(root, number, ext), None
+        tree, following = following, next(trees, None)
+        number += 1
+
+
+def copy_tree(tree, source, output_file, precision=None):
+    """copy the source file when it holds only this tree, else write it.
+    it is also written when the branch lengths are to be rounded or the
+    source is a binary tree file, outputs are always newick"""
+    if (source and precision is None
+            and not binary_trees.is_binary_file(source)):
+        copyfile(source, output_file)
+    else:
+        save_tree(tree, output_file, precision)
+
+
+def save_tree(tree, output_file, precision=None):
+    """write a tree to its own file"""
+    with open(output_file, "w") as outfile:
+        newick3.write_tree(tree, outfile, precision)
+
+
 def get_front_labels(node):
     """given a node, return a list of front tip labels"""
     leaves = node.leaves()
@@ -79,80 +118,87 @@ def pass_boot_filter(node, min_ave_boot):
 def get_ortho_from_rooted_inclade(inclade):
     """
     input a rooted tree
-    cut apart bifurcating nodes when duplicated taxonIDs are detected
+    cut apart bifurcating nodes when duplicated taxonIDs are detected.
+    children that share no taxa never will, cuts only remove taxa, so
+    each clade keeps the stack of nodes it has left to check from one
+    round to the next instead of walking again from its root
     """
     assert inclade.nchildren == 2, "input clade not properly rooted"
     orthologs = []  # store ortho clades
-    clades = [inclade]
-    while True:
+    clades = [(inclade, [inclade])]  # a clade and its nodes left to check
+    while clades:
         newclades = []  # keep track of subclades generated in this round
-        for clade in clades:
-            num_taxa = len(set(get_front_names(clade)))
-            num_tips = len((get_front_labels(clade)))
-            if num_taxa == num_tips:  # no taxon repeats
+        for clade, stack in clades:
+            if not clade.has_duplicates():  # no taxon repeats
                 orthologs.append(clade)
-            else:  # has duplicated taxa
-                for node in clade.iternodes(order=0):  # PREORDER, root to tip
-                    if node.istip:
-                        continue
-                    # traverse the tree from root to tip
-                    child0, child1 = node.children[0], node.children[1]
-                    name_set0 = set(get_front_names(child0))
-                    name_set1 = set(get_front_names(child1))
-                    if len(name_set0.intersection(name_set1)) > 0:
-                        if node == clade:
-                            newclades += [child0,
-                                          child1]  # break by bifid at the base
-                        elif len(name_set0) > len(name_set1):  # cut the side
-                            # with less taxa
-                            node.remove_child(child1)
-                            child1.prune()
-                            node, clade = remove_kink(node,
-                                                      clade)  # no rerooting
-                            # here
-                            newclades += [clade, child1]
-                        else:
-                            node.remove_child(child0)
-                            child0.prune()
-                            node, clade = remove_kink(node,
-                                                      clade)  # no rerooting
-                            # here
-                            newclades += [clade, child0]
-                        break
-        if not newclades:
-            break
+                continue
+            while stack:  # PREORDER, root to tip
+                node = stack.pop()
+                if node.istip:
+                    continue
+                child0, child1 = node.children[0], node.children[1]
+                if not child0.taxon_mask() & child1.taxon_mask():
+                    stack.extend(reversed(node.children))
+                    continue
+                if node == clade:  # break by bifid at the base
+                    newclades += [(child0, [child0]), (child1, [child1])]
+                    break
+                if child0.taxon_count() > child1.taxon_count():
+                    cut = child1  # cut the side with less taxa
+                else:
+                    cut = child0
+                node.remove_child(cut)
+                cut.prune()
+                # remove_kink moves the kept child behind its sisters
+                sisters = node.parent.children
+                waiting = len(sisters) - sisters.index(node) - 1
+                node, clade = remove_kink(node, clade)  # no rerooting here
+                stack.insert(len(stack) - waiting, node)
+                newclades += [(clade, stack), (cut, [cut])]
+                break
         clades = newclades
     return orthologs
 
 
+class UnknownTaxonError(ValueError):
+    """a tip's taxon ID is in neither the ingroups nor the outgroups"""
+
+
+def get_taxa_mask(names):
+    """the taxon mask for a group of taxon IDs"""
+    mask = 0
+    for name in names:
+        mask |= 1 << phylo3.taxon_bit(name)
+    return mask
+
+
+def get_side_score(mask, outgroup_mask):
+    """-1 if there are outgroups on this side, else the number of taxa"""
+    if mask & outgroup_mask:
+        return -1
+    return bin(mask).count("1")
+
+
 def extract_rooted_ingroup_clades(root, ingroups, outgroups, min_ingroup_taxa):
     """
     input a tree with ingroups and at least 1 outgroups
     output a list of rooted ingroup clades
+    raise UnknownTaxonError if a taxon is not an ingroup or outgroup
     """
+    known = get_taxa_mask(ingroups) | get_taxa_mask(outgroups)
+    outgroup_mask = get_taxa_mask(outgroups)
+    unknown = root.taxon_mask() & ~known
+    if unknown:
+        raise UnknownTaxonError(
+            "Check taxonID " + min(phylo3.taxon_names(unknown)))
+
     inclades = []
     while True:
         max_score, direction, max_node = 0, "", None
+        backs = phylo3.back_summaries(root)
         for node in root.iternodes():
-            front, back = 0, 0
-            front_names_set = set(get_front_names(node))
-            for name in front_names_set:
-                if name in outgroups:
-                    front = -1
-                    break
-                if name in ingroups:
-                    front += 1
-                else:
-                    sys.exit("Check taxonID " + name)
-            back_names_set = set(get_back_names(node, root))
-            for name in back_names_set:
-                if name in outgroups:
-                    back = -1
-                    break
-                if name in ingroups:
-                    back += 1
-                else:
-                    sys.exit("Check taxonID " + name)
+            front = get_side_score(node.taxon_mask(), outgroup_mask)
+            back = get_side_score(backs[node][1], outgroup_mask)
             if front > max_score:
                 max_score, direction, max_node = front, "front", node
             if back > max_score:
@@ -162,7 +208,7 @@ def extract_rooted_ingroup_clades(root, ingroups, outgroups, min_ingroup_taxa):
             if direction == "front":
                 inclades.append(max_node)
                 kink = max_node.prune()
-                if len(root.leaves()) > 3:
+                if root.tip_count() > 3:
                     _, root = remove_kink(kink, root)
                 else:
                     break
@@ -171,7 +217,7 @@ def extract_rooted_ingroup_clades(root, ingroups, outgroups, min_ingroup_taxa):
                 par.remove_child(max_node)
                 max_node.prune()
                 inclades.append(phylo3.reroot(root, par))  # flip direction
-                if len(max_node.leaves()) > 3:
+                if max_node.tip_count() > 3:
                     max_node, root = remove_kink(max_node, max_node)
                 else:
                     break
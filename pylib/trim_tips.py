@@ -20,7 +20,7 @@ def check_contrast_outlier(node0, node1, above0, above1, relative_cutoff):
 
 def remove_a_tip(root, tip_node):
     node = tip_node.prune()
-    if len(root.leaves()) > 3:
+    if root.tip_count() > 3:
         node, root = remove_kink(node, root)
         return root
     else:
@@ -32,7 +32,7 @@ def trim(curroot, relative_cutoff, absolute_cutoff):
     if curroot.nchildren == 2:
         remove_kink(curroot, curroot)
     going = True
-    while going and curroot is not None and len(curroot.leaves()) > 3:
+    while going and curroot is not None and curroot.tip_count() > 3:
         going = False
         for i in curroot.iternodes(order=1):  # POSTORDER
             if i.nchildren == 0:  # at the tip
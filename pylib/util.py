@@ -1,7 +1,7 @@
 """Misc. utilities and constants."""
 
 import os
-from os.path import basename, expanduser, join, splitext
+from os.path import abspath, basename, join, splitext
 from glob import glob
 from shutil import rmtree
 from tempfile import mkdtemp
@@ -24,7 +24,7 @@ def shorten(text):
 @contextmanager
 def make_temp_dir(where=None, prefix=None, keep=False):
     """Handle creation and deletion of a temporary directory."""
-    temp_dir = mkdtemp(prefix=prefix, dir=where)
+    temp_dir = abspath(mkdtemp(prefix=prefix, dir=where))
     try:
         yield temp_dir
     finally:
@@ -32,17 +32,6 @@ def make_temp_dir(where=None, prefix=None, keep=False):
             rmtree(temp_dir)
 
 
-@contextmanager
-def cd(new_dir):
-    """Change to a new working directory."""
-    prev_dir = os.getcwd()
-    os.chdir(expanduser(new_dir))
-    try:
-        yield
-    finally:
-        os.chdir(prev_dir)
-
-
 def remove_files(pattern):
     """Remove all files matching the given pattern."""
     for path in glob(pattern):
@@ -62,9 +51,3 @@ def file_name(base_name, ext=None, dir_=None):
     if ext:
         path += ext
     return path
-
-
-def count_tree_taxa(tree):
-    """Count the number of taxa in the tree."""
-    taxa = [taxon_id(n.name) for n in tree.get_terminals()]
-    return len(set(taxa))
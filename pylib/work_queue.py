@@ -0,0 +1,111 @@
+"""A work queue kept in the output directory.
+
+Any number of worker processes, on any machine that can see the output
+directory, take genes from the queue, run a step on them, and mark them
+done. A worker holds a lease on each gene it takes. If the worker dies
+the lease runs out and another worker takes the gene.
+"""
+
+import json
+import time
+import sqlite3
+from os.path import join
+
+QUEUE = 'queue.sqlite'
+LEASE = 600  # Seconds
+
+TODO = 'todo'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class WorkQueue:
+    """The queue of genes for a step."""
+
+    def __init__(self, output_dir):
+        self.path = join(output_dir, QUEUE)
+        self.cxn = sqlite3.connect(
+            self.path, timeout=600, isolation_level=None)
+        self.cxn.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                key   TEXT PRIMARY KEY,
+                value TEXT)""")
+        self.cxn.execute("""
+            CREATE TABLE IF NOT EXISTS queue (
+                path    TEXT PRIMARY KEY,
+                status  TEXT,
+                worker  TEXT,
+                expires REAL,
+                tries   INTEGER DEFAULT 0,
+                error   TEXT)""")
+
+    def close(self):
+        """Close the database connection."""
+        self.cxn.close()
+
+    def load(self, step, args, paths):
+        """Save the step and its arguments and add the genes to the queue."""
+        self.cxn.execute('BEGIN IMMEDIATE')
+        try:
+            self.cxn.execute(
+                'INSERT OR REPLACE INTO settings VALUES (?, ?)',
+                ('step', step))
+            self.cxn.execute(
+                'INSERT OR REPLACE INTO settings VALUES (?, ?)',
+                ('args', json.dumps(args)))
+            self.cxn.executemany(
+                """INSERT OR REPLACE INTO queue (path, status)
+                   VALUES (?, ?)""",
+                [(p, TODO) for p in paths])
+        except Exception:
+            self.cxn.execute('ROLLBACK')
+            raise
+        self.cxn.execute('COMMIT')
+
+    def settings(self):
+        """Get the step name and its arguments."""
+        values = dict(self.cxn.execute('SELECT key, value FROM settings'))
+        return values['step'], json.loads(values['args'])
+
+    def claim(self, worker, lease=LEASE):
+        """Take the next gene that is not done or held by a live worker."""
+        now = time.time()
+        self.cxn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.cxn.execute(
+                """SELECT path FROM queue
+                    WHERE status = ? OR (status = ? AND expires < ?)
+                    ORDER BY rowid LIMIT 1""",
+                (TODO, RUNNING, now)).fetchone()
+            if row:
+                self.cxn.execute(
+                    """UPDATE queue
+                          SET status = ?, worker = ?, expires = ?,
+                              tries = tries + 1
+                        WHERE path = ?""",
+                    (RUNNING, worker, now + lease, row[0]))
+        except Exception:
+            self.cxn.execute('ROLLBACK')
+            raise
+        self.cxn.execute('COMMIT')
+        return row[0] if row else None
+
+    def renew(self, path, worker, lease=LEASE):
+        """Extend the lease on a gene we are still working on."""
+        self.cxn.execute(
+            """UPDATE queue SET expires = ?
+                WHERE path = ? AND worker = ? AND status = ?""",
+            (time.time() + lease, path, worker, RUNNING))
+
+    def finish(self, path, worker, error=None):
+        """Mark a gene as done or failed."""
+        self.cxn.execute(
+            """UPDATE queue SET status = ?, error = ?
+                WHERE path = ? AND worker = ?""",
+            (FAILED if error else DONE, error, path, worker))
+
+    def counts(self):
+        """Count the genes in each status."""
+        return dict(self.cxn.execute(
+            'SELECT status, COUNT(*) FROM queue GROUP BY status'))
@@ -1,32 +1,70 @@
 """Cut long internal branches."""
 
-from Bio import Phylo
-from pylib import util
+from os.path import splitext
+from pylib import newick3, util
+from pylib.tree_utils import remove_kink
 
 
 def cut_branches(tree_file, output_dir, output_ext, branch_cutoff, min_taxa):
-    """Cut long internal branches."""
-    tree = Phylo.read(tree_file, 'newick')
+    """Cut long internal branches and write the subtrees that are left.
 
-    subtrees = cut_deep(tree, branch_cutoff, min_taxa)
+    Only subtrees with at least min_taxa taxa are written. Return the
+    subtree files.
+    """
+    tree = newick3.parse_from_file(tree_file)
+    if tree is None or tree.taxon_count() < min_taxa:
+        return []
 
-    with util.cd(output_dir):
-        for i, subtree in enumerate(subtrees):
-            output = '{}_{}'.format(tree_file, i)
-            output = util.file_name(output, output_ext)
-            Phylo.write(subtree, output, 'newick')
+    root, ext = splitext(tree_file)
+    outputs = []
+    for i, subtree in enumerate(cut_deep(tree, branch_cutoff, min_taxa), 1):
+        if subtree.nchildren == 2:  # fix bifurcating roots from cutting
+            _, subtree = remove_kink(subtree, subtree)
+        output = '{}_{}{}'.format(root, i, ext)
+        output = util.file_name(output, output_ext, output_dir)
+        with open(output, 'w') as out_file:
+            newick3.write_tree(subtree, out_file)
+        outputs.append(output)
 
-    return output
+    return outputs
 
 
-def cut_deep(tree, branch_cutoff, min_taxa):
-    """Remove interior nodes if brances are too deep."""
-    subtrees = []
+def cut_deep(root, branch_cutoff, min_taxa):
+    """Cut internal branches that are longer than the cutoff.
 
-    leaves = [n for n in tree.get_terminals()]
-    nodes = [n for n in tree.get_nonterminals()]
+    The clade under a long branch becomes a subtree. When both of its
+    children are clades that are also far apart then they each become a
+    subtree. The rest of the tree is cut again until there are no long
+    branches left. Return the subtrees with at least min_taxa taxa.
+    """
+    subtrees = []
 
-    for node in nodes:
-        children = [n for n in nodes if n in node]
+    going = True
+    while going:
+        going = False
+        for node in root.iternodes():
+            if node.istip or node == root:
+                continue
+            if node.nchildren == 1:
+                node, root = remove_kink(node, root)
+                going = True
+                break
+            if node.length > branch_cutoff:
+                child0, child1 = node.children[0], node.children[1]
+                if (not child0.istip and not child1.istip
+                        and child0.length + child1.length > branch_cutoff):
+                    cut = [child0, child1]
+                    for child in cut:
+                        node.remove_child(child)
+                else:
+                    cut = [node]
+                subtrees += [c for c in cut if c.taxon_count() >= min_taxa]
+                node = node.prune()
+                if len(root.leaves()) > 2:  # no kink if only two are left
+                    node, root = remove_kink(node, root)
+                    going = True
+                break
 
+    if root.taxon_count() >= min_taxa:
+        subtrees.append(root)  # the rest of the tree after cutting
     return subtrees
@@ -1,21 +1,32 @@
 """Wrap fasttree functions."""
 
-import subprocess
+from os.path import abspath, basename, join
+from shutil import move
 from pylib import util
+from pylib import engine
+from pylib import cache
 
 
+@engine.tool
 def fasttree(fasta_file, output_dir, output_ext, seq_type):
     """Build a tree with fasttree."""
+    fasta_file = abspath(fasta_file)
+
     cmd = ['fasttree', '-quiet']
     cmd += ['-wag'] if seq_type == 'aa' else ['-nt', '-gtr']
     cmd.append(fasta_file)
     cmd = ' '.join(cmd)
 
-    tree_file = util.file_name(fasta_file, output_ext)
+    tree_file = util.file_name(fasta_file, output_ext, abspath(output_dir))
 
-    with util.cd(output_dir):
-        result = subprocess.check_output(cmd, shell=True)
-        with open(tree_file, 'wb') as out_file:
-            out_file.write(result)
+    cache_key = cache.key(fasta_file, cmd)
+    if not cache.fetch(cache_key, tree_file):
+        with util.make_temp_dir(where=output_dir) as temp_dir:
+            # The input and the tree may be the same file, so do not
+            # overwrite it until fasttree is done with it
+            temp_tree = join(temp_dir, basename(tree_file))
+            yield engine.Command(cmd, cwd=temp_dir, stdout=temp_tree)
+            move(temp_tree, tree_file)
+        cache.store(cache_key, tree_file)
 
     return tree_file
@@ -1,15 +1,19 @@
 """Wrap mafft alignment tool."""
 
-import subprocess
+from os.path import abspath, basename, join
+from shutil import move
 from pylib import util
+from pylib import engine
 from pylib import bio
+from pylib import cache
 
 MAX_ITERATE = 10_000
 
 
+@engine.tool
 def mafft(fasta_file, output_dir, output_ext, seq_type, cpus, anysymbol):
     """Align sequences."""
-    in_path = fasta_file
+    in_path = abspath(fasta_file)
     if seq_type == 'aa':
         in_path = bio.adjust_aa_seqs(fasta_file, output_dir)
 
@@ -31,11 +35,15 @@ def mafft(fasta_file, output_dir, output_ext, seq_type, cpus, anysymbol):
     cmd.append(in_path)
     cmd = ' '.join(cmd)
 
-    aligned = util.file_name(fasta_file, output_ext)
+    aligned = util.file_name(fasta_file, output_ext, abspath(output_dir))
 
-    with util.cd(output_dir):
-        result = subprocess.check_output(cmd, shell=True)
-        with open(aligned, 'wb') as out_file:
-            out_file.write(result)
+    cache_key = cache.key(in_path, cmd, ignore='--thread {}'.format(cpus))
+    if not cache.fetch(cache_key, aligned):
+        with util.make_temp_dir(where=output_dir) as temp_dir:
+            # Do not overwrite the input until mafft is done with it
+            temp_aligned = join(temp_dir, basename(aligned))
+            yield engine.Command(cmd, cwd=temp_dir, stdout=temp_aligned)
+            move(temp_aligned, aligned)
+        cache.store(cache_key, aligned)
 
     return aligned
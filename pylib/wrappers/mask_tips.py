@@ -2,8 +2,8 @@
 
 import re
 from itertools import groupby
-from Bio import Phylo
-from pylib import util
+from pylib import binary_trees, newick3, util
+from pylib.phylo3 import PREORDER
 
 
 IGNORE = re.compile(r'[x*?\-]', re.IGNORECASE)
@@ -11,31 +11,72 @@ IGNORE = re.compile(r'[x*?\-]', re.IGNORECASE)
 MIN_TREE = 4
 
 
-def mask_tips(tree_file, output_dir, output_ext):
-    """Wrap tree tip removal."""
-    tree = Phylo.read(tree_file, 'newick')
+def mask_tips(tree_file, output_dir, output_ext, binary=False):
+    """Wrap tree tip removal for every tree in the file.
 
-    mask_monophyletic_tips(tree)
+    The trees are read, masked, and written one at a time. With binary the
+    output is a binary tree file for the steps that follow.
+    """
+    trees = newick3.trees_from_file(tree_file)
 
-    output = util.file_name(tree_file, output_ext)
-    with util.cd(output_dir):
-        Phylo.write(tree, output, 'newick')
+    output = util.file_name(tree_file, output_ext, output_dir)
+    if binary:
+        binary_trees.save_trees(masked(trees), output)
+    else:
+        with open(output, 'w') as out_file:
+            newick3.write_trees(masked(trees), out_file)
 
     return output
 
 
-def mask_monophyletic_tips(tree):
-    """Mask monophyletic tips."""
+def masked(trees):
+    """Mask each tree as it is read."""
+    for tree in trees:
+        yield mask_monophyletic_tips(tree)
+
+
+def mask_monophyletic_tips(root):
+    """Mask monophyletic tips.
+
+    Only the tip with the shortest branch is kept from each taxon under a
+    node whose children are all tips. Return the root, it changes when the
+    old root is left with one child.
+    """
     again = True
-    while again and tree.count_terminals() >= MIN_TREE:
+    while again and len(root.leaves()) >= MIN_TREE:
         again = False
-        parents = [n for n in tree.get_nonterminals() if n.is_preterminal()]
+        parents = [n for n in root.iternodes(PREORDER)
+                   if n.children and all(c.istip for c in n.children)]
         for parent in parents:
-            sibs = [s for s in tree.get_terminals() if parent.is_parent_of(s)]
-            sibs = sorted(sibs, key=lambda s: s.name)
+            sibs = sorted(parent.children, key=lambda s: s.label)
             for _, group in groupby(
-                    sibs, key=lambda s: util.taxon_id(s.name)):
-                group = sorted(group, key=lambda s: s.branch_length)
+                    sibs, key=lambda s: util.taxon_id(s.label)):
+                group = sorted(group, key=lambda s: s.length)
                 for node in group[1:]:
-                    tree.prune(node)
+                    root = prune_tip(root, node)
                     again = True
+    return root
+
+
+def prune_tip(root, tip):
+    """Remove a tip and return the root.
+
+    A parent left with one child is replaced by that child, and the
+    child's branch gets the parent's length. If that parent is the root
+    then the child becomes the root.
+    """
+    parent = tip.parent
+    parent.remove_child(tip)
+    if len(parent.children) != 1:
+        return root
+
+    child = parent.children[0]
+    if parent is root:
+        parent.remove_child(child)
+        child.length = 0
+        return child
+
+    if child.length is not None:
+        child.length += parent.length or 0.0
+    parent.parent.replace_child(parent, child)
+    return root
@@ -1,35 +1,38 @@
 """Wrap pasta functions."""
 
-from os.path import abspath, basename, splitext
+from os.path import abspath, basename, join, splitext
 from shutil import move, which
-import subprocess
 from pylib import util
+from pylib import engine
 from pylib import bio
+from pylib import memory
 
 EXT = '.aln'
 
 
+@engine.tool
 def pasta(fasta_file, output_dir, output_ext, seq_type, cpus):
     """Align sequences."""
-    in_path = fasta_file
+    in_path = abspath(fasta_file)
     if seq_type == 'aa':
         in_path = bio.adjust_aa_seqs(fasta_file, output_dir)
 
-    cmd = ' '.join([
-        which('run_pasta.py'),
-        '--datatype {}'.format('Protein' if seq_type == 'aa' else 'DNA'),
-        '--num-cpus {}'.format(cpus),
-        "--input '{}'".format(in_path),
-        "--output-directory '{}'".format(abspath(output_dir))])
+    base_name = splitext(basename(fasta_file))[0]
+    aligned = join(abspath(output_dir), base_name + output_ext)
 
-    with util.cd(output_dir):
-        subprocess.check_call(cmd, shell=True)
+    with util.make_temp_dir(where=output_dir) as temp_dir:
+        cmd = ' '.join([
+            which('run_pasta.py'),
+            '--datatype {}'.format('Protein' if seq_type == 'aa' else 'DNA'),
+            '--num-cpus {}'.format(cpus),
+            "--input '{}'".format(in_path),
+            "--output-directory '{}'".format(temp_dir)])
 
-        base_name = splitext(basename(fasta_file))[0]
-        temp_aligned = 'pastajob.marker001.' + base_name + EXT
-        aligned = base_name + output_ext
-        move(temp_aligned, aligned)
+        yield engine.Command(
+            cmd, cwd=temp_dir, kind=memory.kind('pasta', seq_type),
+            cells=memory.alignment_cells(in_path))
 
-        util.remove_files('pastajob*')
+        temp_aligned = join(temp_dir, 'pastajob.marker001.' + base_name + EXT)
+        move(temp_aligned, aligned)
 
     return aligned
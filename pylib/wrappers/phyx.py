@@ -2,55 +2,63 @@
 
 # pylint: disable=too-many-arguments
 
-from os.path import basename
-import subprocess
+from os.path import abspath
 from Bio.SeqIO.FastaIO import SimpleFastaParser
 from pylib import util
+from pylib import engine
 from pylib import bio
+from pylib import cache
 
 
 MIN_LEN = 10
 EXT_PXCLSQ = '.cln'
 
 
+@engine.tool
 def pxclsq(fasta_file, output_dir, output_ext, seq_type, min_occupancy,
            min_len):
     """Filter aligned sequences for occupancy and length."""
+    fasta_file = abspath(fasta_file)
+    output_dir = abspath(output_dir)
+
     ext = output_ext + EXT_PXCLSQ
-    temp_cleaned = util.file_name(fasta_file, ext)
+    temp_cleaned = util.file_name(fasta_file, ext, output_dir)
 
     cmd = ' '.join([
         'pxclsq',
         '--aminoacid' if seq_type == 'aa' else '',
         '--prop {}'.format(min_occupancy),
         '--seqf {}'.format(fasta_file),
-        '--outf {}'.format(basename(temp_cleaned))])
+        '--outf {}'.format(temp_cleaned)])
 
-    cleaned = util.file_name(fasta_file, output_ext)
+    cleaned = util.file_name(fasta_file, output_ext, output_dir)
 
-    with util.cd(output_dir):
-        subprocess.check_call(cmd, shell=True)
-        with open(temp_cleaned) as in_file, open(cleaned, 'w') as out_file:
-            for header, seq in SimpleFastaParser(in_file):
-                if len(seq.replace('-', '')) >= min_len:
-                    bio.write_fasta_record(out_file, header, seq)
+    cache_key = cache.key(fasta_file, cmd, output=temp_cleaned)
+    if not cache.fetch(cache_key, temp_cleaned):
+        with util.make_temp_dir(where=output_dir) as temp_dir:
+            yield engine.Command(cmd, cwd=temp_dir)
+        cache.store(cache_key, temp_cleaned)
 
-        util.remove_files('phyx.logfile')
+    with open(temp_cleaned) as in_file, open(cleaned, 'w') as out_file:
+        for header, seq in SimpleFastaParser(in_file):
+            if len(seq.replace('-', '')) >= min_len:
+                bio.write_fasta_record(out_file, header, seq)
 
     return cleaned
 
 
+@engine.tool
 def pxrr(tree_file, output_dir):
     """Unroot the tree returned by treeshrink."""
-    unrooted = util.file_name(tree_file)
+    tree_file = abspath(tree_file)
+    unrooted = util.file_name(tree_file, dir_=abspath(output_dir))
     cmd = ' '.join([
         'pxrr',
         '--unroot',
         '--treef {}'.format(tree_file),
         '--outf {}'.format(unrooted)])
 
-    with util.cd(output_dir):
-        subprocess.check_call(cmd, shell=True)
-        util.remove_files('phyx.logfile')
+    with util.make_temp_dir(where=output_dir) as temp_dir:
+        yield engine.Command(cmd, cwd=temp_dir)
 
     return unrooted
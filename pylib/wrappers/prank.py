@@ -1,17 +1,19 @@
 """Wrap prank alignment tool."""
 
-import subprocess
+from os.path import abspath
 from pylib import util
+from pylib import engine
 from pylib import bio
 
 
+@engine.tool
 def prank(fasta_file, output_dir, temp_dir, seq_type):
     """Align sequences."""
-    in_path = fasta_file
+    in_path = abspath(fasta_file)
     if seq_type == 'aa':
         in_path = bio.adjust_aa_seqs(fasta_file, temp_dir)
 
-    aligned = util.file_name(fasta_file, 'ortho.aln')
+    aligned = util.file_name(fasta_file, 'ortho.aln', abspath(output_dir))
 
     cmd = [
         'prank',
@@ -22,9 +24,6 @@ def prank(fasta_file, output_dir, temp_dir, seq_type):
 
     cmd = ' '.join(cmd)
 
-    with util.cd(temp_dir):
-        result = subprocess.check_output(cmd)
-        with open(aligned, 'wb') as out_file:
-            out_file.write(result)
+    yield engine.Command(cmd, cwd=temp_dir, stdout=aligned)
 
     return aligned
@@ -10,36 +10,32 @@ If not to output 1-to-1 orthologs, for example, already analysed these
 set OUTPUT_1to1_ORTHOLOGS to False
 """
 
-from shutil import copyfile
-from pylib import util, trim_tips, newick3, tree_utils
+import logging
+from pylib import phylo3, util, trim_tips, tree_utils
 
 OUTPUT_1to1_ORTHOLOGS = True
 
 
 def get_front_score(node):
-    front_labels = tree_utils.get_front_labels(node)
-    num_labels = len(front_labels)
-    num_taxa = len(set(tree_utils.get_name(i) for i in front_labels))
-    if num_taxa == num_labels:
-        return num_taxa
-    return -1
+    if node.has_duplicates():
+        return -1
+    return node.tip_count()
 
 
-def get_back_score(node, root):
-    back_labels = tree_utils.get_back_labels(node, root)
-    num_labels = len(back_labels)
-    num_taxa = len(set(tree_utils.get_name(i) for i in back_labels))
-    if num_taxa == num_labels:
-        return num_taxa
-    return -1
+def get_back_score(node, backs):
+    """backs maps nodes to the summaries of the tips outside them"""
+    num_tips, _, has_duplicates = backs[node]
+    if has_duplicates:
+        return -1
+    return num_tips
 
 
 def prune(score_tuple, node, root, pp_trees):
     if score_tuple[0] > score_tuple[1]:  # prune front
-        print("prune front")
+        logging.info("prune front")
         pp_trees.append(node)
         par = node.prune()
-        if par is not None and len(root.leaves()) >= 3:
+        if par is not None and root.tip_count() >= 3:
             par, root = tree_utils.remove_kink(par, root)
         return root, node == root
     if node != root:  # prune back
@@ -48,9 +44,9 @@ def prune(score_tuple, node, root, pp_trees):
         if par.parent is not None:
             par, root = tree_utils.remove_kink(par, root)
     node.prune()
-    print("prune back")
+    logging.info("prune back")
     pp_trees.append(root)
-    if len(node.leaves()) >= 3:
+    if node.tip_count() >= 3:
         node, newroot = tree_utils.remove_kink(node, node)
     else:
         newroot = node
@@ -58,19 +54,26 @@ def prune(score_tuple, node, root, pp_trees):
 
 
 def prune_mi(tree_file, output_dir, min_taxa,
-             relative_tip_cutoff, absolute_tip_cutoff):
+             relative_tip_cutoff, absolute_tip_cutoff, precision=None):
     output_files = []
+    for intree, name, source in tree_utils.read_trees(tree_file):
+        output_files += prune_mi_tree(
+            intree, name, source, output_dir, min_taxa,
+            relative_tip_cutoff, absolute_tip_cutoff, precision)
+    return output_files
+
 
-    with open(tree_file) as infile:  # only 1 tree in each file
-        intree = newick3.parse(infile.readline())
+def prune_mi_tree(intree, tree_file, source, output_dir, min_taxa,
+                  relative_tip_cutoff, absolute_tip_cutoff, precision=None):
+    output_files = []
     curroot = intree
 
     if get_front_score(curroot) >= min_taxa:  # No need to prune
-        print("No pruning needed")
+        logging.info("No pruning needed")
         if OUTPUT_1to1_ORTHOLOGS:
             output_file = util.file_name(tree_file, '_1to1ortho.tre',
                                          output_dir)
-            copyfile(tree_file, output_file)
+            tree_utils.copy_tree(curroot, source, output_file, precision)
             output_files.append(output_file)
     else:  # scoring the tree
         pp_trees = []
@@ -79,9 +82,10 @@ def prune_mi(tree_file, output_dir, min_taxa,
             highest = 0
             highest_node = None
             score_hashes = {}   # key: node, value: (front_score,back_score)
+            backs = phylo3.back_summaries(curroot)
             for node in curroot.iternodes():
                 front_score = get_front_score(node)
-                back_score = get_back_score(node, curroot)
+                back_score = get_back_score(node, backs)
                 score_hashes[node] = (front_score, back_score)
                 if front_score > highest or back_score > highest:
                     highest_node = node
@@ -90,7 +94,7 @@ def prune_mi(tree_file, output_dir, min_taxa,
                 curroot, done = prune(
                     score_hashes[highest_node], highest_node,
                     curroot, pp_trees)
-                if done or len(curroot.leaves()) < min_taxa:
+                if done or curroot.tip_count() < min_taxa:
                     break
             else:
                 break
@@ -102,13 +106,12 @@ def prune_mi(tree_file, output_dir, min_taxa,
                     node, tree = tree_utils.remove_kink(tree, tree)
                 tree = trim_tips.trim(tree, relative_tip_cutoff,
                                       absolute_tip_cutoff)
-                if tree is not None and len(tree.leaves()) >= min_taxa:
+                if tree is not None and tree.tip_count() >= min_taxa:
                     output_file = util.file_name(tree_file,
                                                  '_MIortho{}.tre'.format(
                                                      count), output_dir)
                     output_files.append(output_file)
-                    with open(output_file, "w") as outfile:
-                        outfile.write(newick3.tostring(tree) + ";\n")
+                    tree_utils.save_tree(tree, output_file, precision)
                     count += 1
 
     return output_files
@@ -21,8 +21,9 @@ If not to output 1-to-1 orthologs, for example, already analysed these
 set OUTPUT_1TO1_ORTHOLOGS to False
 """
 
-from shutil import copyfile
-from pylib import util, phylo3, newick3
+import logging
+from pylib import util, phylo3
+from pylib.tree_utils import copy_tree, read_trees, save_tree
 
 OUTPUT_1TO1_ORTHOLOGS = True
 
@@ -96,24 +97,23 @@ def reroot_with_monophyletic_outgroups(root, out_groups):
         new_root = outgroup_matches[outgroup_labels[0]].parent
         return phylo3.reroot(root, new_root)
 
+    # count the in- and out-group tips under each node as we go up the
+    # tree, the tips behind a node are the rest of them
+    total_out = len(outgroup_labels)
+    total_in = len(lvs) - total_out
+    out_counts = {}  # key is node, value is its number of out-group tips
     newroot = None
     for node in root.iternodes():
+        if node.istip:
+            front_out_names = int(node.label in outgroup_matches)
+        else:
+            front_out_names = sum(out_counts[c] for c in node.children)
+        out_counts[node] = front_out_names
         if node == root:
             continue  # skip the root
-        front_names = get_front_names(node)
-        back_names = get_back_names(node, root)
-        front_in_names, front_out_names, back_in_names, back_out_names =\
-            0, 0, 0, 0
-        for i in front_names:
-            if i in out_groups:
-                front_out_names += 1
-            else:
-                front_in_names += 1
-        for j in back_names:
-            if j in out_groups:
-                back_out_names += 1
-            else:
-                back_in_names += 1
+        front_in_names = node.tip_count() - front_out_names
+        back_in_names = total_in - front_in_names
+        back_out_names = total_out - front_out_names
         if front_in_names == 0 and front_out_names > 0 \
                 and back_in_names > 0 and back_out_names == 0:
             newroot = node  # in-group at back, out-group in front
@@ -128,8 +128,13 @@ def reroot_with_monophyletic_outgroups(root, out_groups):
 
 
 def prune_paralogs_from_rerooted_homotree(root, out_groups):
-    if len(get_front_names(root)) == len(set(get_front_names(root))):
+    if not root.has_duplicates():
         return root  # no pruning needed
+    cut_root_clades(root, out_groups)
+    return cut_duplicates(root)
+
+
+def cut_root_clades(root, out_groups):
     # check for duplications at the root first
     # one or two of the trifurcating root clades are in-group clades
     node0, node1, node2 = root.children[0], root.children[1], root.children[2]
@@ -137,63 +142,84 @@ def prune_paralogs_from_rerooted_homotree(root, out_groups):
     out1 = len(get_front_outgroup_names(node1, out_groups))
     out2 = len(get_front_outgroup_names(node2, out_groups))
     if out0 == 0 and out1 == 0:  # 0 and 1 are the in-group clades
-        name_set0 = set(get_front_names(node0))
-        name_set1 = set(get_front_names(node1))
-        if len(name_set0.intersection(name_set1)) > 0:
-            if len(name_set0) > len(name_set1):  # cut the side with less taxa
+        if node0.taxon_mask() & node1.taxon_mask():
+            if node0.taxon_count() > node1.taxon_count():
+                # cut the side with less taxa
                 root.remove_child(node1)
                 node1.prune()
             else:
                 root.remove_child(node0)
                 node0.prune()
     elif out1 == 0 and out2 == 0:  # 1 and 2 are the in-group clades
-        name_set1 = set(get_front_names(node1))
-        name_set2 = set(get_front_names(node2))
-        if len(name_set1.intersection(name_set2)) > 0:
-            if len(name_set1) > len(name_set2):  # cut the side with less taxa
+        if node1.taxon_mask() & node2.taxon_mask():
+            if node1.taxon_count() > node2.taxon_count():
+                # cut the side with less taxa
                 root.remove_child(node2)
                 node2.prune()
             else:
                 root.remove_child(node1)
                 node1.prune()
     elif out0 == 0 and out2 == 0:  # 0 and 2 are the in-group clades
-        name_set0 = set(get_front_names(node0))
-        name_set2 = set(get_front_names(node2))
-        if len(name_set0.intersection(name_set2)) > 0:
-            if len(name_set0) > len(name_set2):  # cut the side with less taxa
+        if node0.taxon_mask() & node2.taxon_mask():
+            if node0.taxon_count() > node2.taxon_count():
+                # cut the side with less taxa
                 root.remove_child(node2)
                 node2.prune()
             else:
                 root.remove_child(node0)
                 node0.prune()
-    while len(get_front_names(root)) > len(set(get_front_names(root))):
-        for node in root.iternodes(order=0):  # PREORDER, root to tip
-            if node.istip or node == root:
-                continue
-            child0, child1 = node.children[0], node.children[1]
-            name_set0 = set(get_front_names(child0))
-            name_set1 = set(get_front_names(child1))
-            if len(name_set0.intersection(name_set1)) > 0:
-                if len(name_set0) > len(name_set1):  # cut side w/ fewer taxa
-                    node.remove_child(child1)
-                    child1.prune()
-                else:
-                    node.remove_child(child0)
-                    child0.prune()
-                node, root = remove_kink(node, root)  # no rerooting here
-                break
+
+
+def cut_duplicates(root):
+    # cut duplicated taxa from root to tip in one preorder pass. a node
+    # with no taxa shared by its children never gets any, cuts only remove
+    # taxa, so each node is checked once. remove_kink moves the kept child
+    # to the end of its parent's children, so it waits behind its sisters.
+    # a multifurcating parent then has new first two children and is
+    # checked again before its sisters, as a restart from the root would
+    stack = list(reversed(root.children))  # the root is not checked
+    while stack:
+        node = stack.pop()
+        if node.istip:
+            continue
+        child0, child1 = node.children[0], node.children[1]
+        if child0.taxon_mask() & child1.taxon_mask():
+            if child0.taxon_count() > child1.taxon_count():
+                # cut side w/ fewer taxa
+                node.remove_child(child1)
+                child1.prune()
+            else:
+                node.remove_child(child0)
+                child0.prune()
+            parent, sisters = node.parent, node.parent.children
+            waiting = len(sisters) - sisters.index(node) - 1
+            node, root = remove_kink(node, root)  # no rerooting here
+            if parent != root and parent.nchildren > 2:
+                del stack[len(stack) - waiting:]
+                stack.append(parent)
+            else:
+                stack.insert(len(stack) - waiting, node)
+        else:
+            stack.extend(reversed(node.children))
     return root
 
 
-def prune_mo(tree_file, output_dir, min_taxa, out_groups):
+def prune_mo(tree_file, output_dir, min_taxa, out_groups, precision=None):
+    output_files = []
+    for intree, name, source in read_trees(tree_file):
+        output_files += prune_mo_tree(
+            intree, name, source, output_dir, min_taxa, out_groups,
+            precision)
+    return output_files
+
+
+def prune_mo_tree(intree, tree_file, source, output_dir, min_taxa,
+                  out_groups, precision=None):
     output_files = []
 
-    # read in the tree and check number of taxa
-    with open(tree_file) as infile:
-        intree = newick3.parse(infile.readline())
+    # check number of taxa
     curroot = intree
-    names = get_front_names(curroot)
-    num_tips, num_taxa = len(names), len(set(names))
+    num_tips, num_taxa = curroot.tip_count(), curroot.taxon_count()
     if num_taxa < min_taxa:
         return output_files  # not enough taxa
 
@@ -202,7 +228,7 @@ def prune_mo(tree_file, output_dir, min_taxa, out_groups):
         if OUTPUT_1TO1_ORTHOLOGS:
             output_file = util.file_name(tree_file, '_1to1ortho.tre',
                                          output_dir)
-            copyfile(tree_file, output_file)
+            copy_tree(curroot, source, output_file, precision)
             output_files.append(output_file)
     else:
         # now need to deal with taxon duplications
@@ -212,11 +238,11 @@ def prune_mo(tree_file, output_dir, min_taxa, out_groups):
 
         # if no out-group at all, do not resolve gene duplication
         if len(outgroup_names) == 0:
-            print("duplicated taxa in unrooted tree")
+            logging.info("duplicated taxa in unrooted tree")
 
         # skip the homolog if there are duplicated out-group taxa
         elif len(outgroup_names) > len(set(outgroup_names)):
-            print("outgroup contains taxon repeats")
+            logging.info("outgroup contains taxon repeats")
 
         else:  # at least one out-group present and there's no out-group
             # duplication
@@ -225,22 +251,23 @@ def prune_mo(tree_file, output_dir, min_taxa, out_groups):
             curroot = reroot_with_monophyletic_outgroups(curroot, out_groups)
             # only return one tree after pruning
             if curroot is not None:
-                output_file = util.file_name(tree_file, '.reroot')
+                output_file = util.file_name(tree_file, '.reroot',
+                                             output_dir)
                 output_files.append(output_file)
-                with open(output_file, "w") as outfile:
-                    outfile.write(newick3.tostring(curroot) + ";\n")
+                save_tree(curroot, output_file, precision)
                 ortho = prune_paralogs_from_rerooted_homotree(
                     curroot, out_groups)
-                if len(set(get_front_names(curroot))) >= min_taxa:
+                if ortho.has_duplicates():
+                    # a multifurcation can leave duplicates we cannot cut
+                    logging.warning("duplicated taxa left after pruning")
+                elif curroot.taxon_count() >= min_taxa:
                     output_file = util.file_name(tree_file, '.ortho.tre',
                                                  output_dir)
-                    output_file += '.ortho.tre'
                     output_files.append(output_file)
-                    with open(output_file, "w") as outfile:
-                        outfile.write(newick3.tostring(ortho) + ";\n")
+                    save_tree(ortho, output_file, precision)
                 else:
-                    print("not enough taxa after pruning")
+                    logging.info("not enough taxa after pruning")
             else:
-                print("out-group non-monophyletic")
+                logging.info("out-group non-monophyletic")
 
     return output_files
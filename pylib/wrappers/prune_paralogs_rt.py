@@ -9,11 +9,12 @@ OUT taxonID3
 """
 
 import sys
-import pylib.newick3 as newick3
+import logging
 from pylib import util, tree_utils
 
 
-def prune_rt(tree_file, output_dir, min_taxa, taxon_code_file):
+def prune_rt(tree_file, output_dir, min_taxa, taxon_code_file,
+             precision=None):
     output_files = []
     in_groups = []
     out_groups = []
@@ -27,19 +28,27 @@ def prune_rt(tree_file, output_dir, min_taxa, taxon_code_file):
             elif spls[0] == "OUT":
                 out_groups.append(spls[1])
             else:
-                print("Check taxon_code_file file format")
+                logging.error("Check taxon_code_file file format")
                 sys.exit()
     if len(set(in_groups) & set(out_groups)) > 0:
-        print("Taxon ID", set(in_groups) & set(out_groups),
-              "in both ingroups and outgroups")
+        logging.error("Taxon ID {} in both ingroups and outgroups".format(
+            set(in_groups) & set(out_groups)))
         sys.exit(0)
-    print(len(in_groups), "ingroup taxa and", len(out_groups),
-          "outgroup taxa read")
-    print("Ingroups:", in_groups)
-    print("Outgroups:", out_groups)
+    logging.info("{} ingroup taxa and {} outgroup taxa read".format(
+        len(in_groups), len(out_groups)))
+    logging.info("Ingroups: {}".format(in_groups))
+    logging.info("Outgroups: {}".format(out_groups))
 
-    with open(tree_file) as infile:
-        intree = newick3.parse(infile.readline())
+    for intree, name, _ in tree_utils.read_trees(tree_file):
+        output_files += prune_rt_tree(
+            intree, name, output_dir, min_taxa, in_groups, out_groups,
+            precision)
+    return output_files
+
+
+def prune_rt_tree(intree, tree_file, output_dir, min_taxa,
+                  in_groups, out_groups, precision=None):
+    output_files = []
     curroot = intree
     all_names = tree_utils.get_front_names(curroot)
     num_taxa = len(set(all_names))
@@ -53,45 +62,43 @@ def prune_rt(tree_file, output_dir, min_taxa, taxon_code_file):
         elif name in out_groups:
             outgroup_names.append(name)
         else:
-            print(name, "not in ingroups or outgroups")
-            sys.exit()
+            raise tree_utils.UnknownTaxonError(
+                "{} not in ingroups or outgroups".format(name))
     if len(set(ingroup_names)) < min_taxa:
-        print("not enough ingroup taxa in tree")
+        logging.info("not enough ingroup taxa in tree")
         return output_files
 
     if len(outgroup_names) > 0:  # >= one outgroup, root & cut inclades
         inclades = tree_utils.extract_rooted_ingroup_clades(
             curroot, in_groups, out_groups, min_taxa)
         inclade_count = 0
+        ortho_count = 0  # numbered across the inclades so none overwrite
         for inclade in inclades:
             inclade_count += 1
             output_file = util.file_name(tree_file,
                                          '.inclade{}'.format(inclade_count),
                                          output_dir)
             output_files.append(output_file)
-            with open(output_file, "w") as outfile:
-                outfile.write(newick3.tostring(inclade) + ";\n")
+            tree_utils.save_tree(inclade, output_file, precision)
             orthologs = tree_utils.get_ortho_from_rooted_inclade(inclade)
-            ortho_count = 0
             for ortho in orthologs:
-                if len(tree_utils.get_front_labels(ortho)) >= min_taxa:
+                if ortho.tip_count() >= min_taxa:
                     ortho_count += 1
                     output_file = util.file_name(
-                        tree_file, '.ortho{}.tre'.format(ortho_count))
+                        tree_file, '.ortho{}.tre'.format(ortho_count),
+                        output_dir)
                     output_files.append(output_file)
-                    with open(output_file, "w") as outfile:
-                        outfile.write(newick3.tostring(ortho) + ";\n")
+                    tree_utils.save_tree(ortho, output_file, precision)
 
     elif len(all_names) == num_taxa:
         # only output ortho tree when there is no taxon repeats
         output_file = util.file_name(tree_file, '.unrooted-ortho.tre',
                                      output_dir)
         output_files.append(output_file)
-        with open(output_file, "w") as outfile:
-            outfile.write(newick3.tostring(curroot) + ";\n")
+        tree_utils.save_tree(curroot, output_file, precision)
 
     else:  # do not attempt to infer direction of gene duplication
         # without out-group info
-        print("duplicated taxa in unrooted tree")
+        logging.info("duplicated taxa in unrooted tree")
 
     return output_files
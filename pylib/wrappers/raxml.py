@@ -2,37 +2,48 @@
 
 # pylint: disable=too-many-arguments
 
+from os.path import abspath, basename, join
 from shutil import move
-import subprocess
 from pylib import util
+from pylib import engine
+from pylib import cache
+from pylib import memory
 
 
+@engine.tool
 def raxml(fasta_file, output_dir, output_ext, seq_type, cpus, seed):
     """Build a tree with raxml."""
+    fasta_file = abspath(fasta_file)
     model = "PROTCATWAG" if seq_type == "aa" else "GTRCAT"
-    tree = util.file_name(fasta_file, output_ext)
+    tree = util.file_name(fasta_file, output_ext, abspath(output_dir))
     cmd = ' '.join([
         'raxml',
         '-T {}'.format(cpus),
         '-p {}'.format(seed),
         '-m {}'.format(model),
         '-s {}'.format(fasta_file),
-        '-n {}'.format(tree)])
+        '-n {}'.format(basename(tree))])
 
-    with util.cd(output_dir):
-        subprocess.check_call(cmd, shell=True)
-        tree_src = 'RAxML_bestTree.' + tree
-        move(tree_src, tree)
-        util.remove_files('RAxML_*')
+    cache_key = cache.key(fasta_file, cmd, ignore='-T {}'.format(cpus))
+    if not cache.fetch(cache_key, tree):
+        with util.make_temp_dir(where=output_dir) as temp_dir:
+            yield engine.Command(
+                cmd, cwd=temp_dir, kind=memory.kind('raxml', seq_type),
+                cells=memory.alignment_cells(fasta_file))
+            tree_src = join(temp_dir, 'RAxML_bestTree.' + basename(tree))
+            move(tree_src, tree)
+        cache.store(cache_key, tree)
 
     return tree
 
 
+@engine.tool
 def raxml_bs(fasta_file, output_dir, output_ext, seq_type, cpus, seed,
              replicates=100):
     """Build a bootstrapped tree with raxml."""
+    fasta_file = abspath(fasta_file)
     model = "PROTCATWAG" if seq_type == "aa" else "GTRCAT"
-    tree = util.file_name(fasta_file, output_ext)
+    tree = util.file_name(fasta_file, output_ext, abspath(output_dir))
     cmd = ' '.join([
         'raxml',
         '-T {}'.format(cpus),
@@ -42,12 +53,16 @@ def raxml_bs(fasta_file, output_dir, output_ext, seq_type, cpus, seed,
         '-m {}'.format(model),
         '-# {}'.format(replicates),
         '-s {}'.format(fasta_file),
-        '-n {}'.format(tree)])
+        '-n {}'.format(basename(tree))])
 
-    with util.cd(output_dir):
-        subprocess.check_call(cmd, shell=True)
-        tree_src = 'RAxML_bipartitions.' + tree
-        move(tree_src, tree)
-        util.remove_files('RAxML_*')
+    cache_key = cache.key(fasta_file, cmd, ignore='-T {}'.format(cpus))
+    if not cache.fetch(cache_key, tree):
+        with util.make_temp_dir(where=output_dir) as temp_dir:
+            yield engine.Command(
+                cmd, cwd=temp_dir, kind=memory.kind('raxml', seq_type),
+                cells=memory.alignment_cells(fasta_file))
+            tree_src = join(temp_dir, 'RAxML_bipartitions.' + basename(tree))
+            move(tree_src, tree)
+        cache.store(cache_key, tree)
 
     return tree
@@ -2,12 +2,13 @@
 
 # pylint: disable=too-many-arguments
 
-import subprocess
-from os.path import basename, join, splitext
+from os.path import abspath, join
 from shutil import move
 from pylib import util
+from pylib import engine
 
 
+@engine.tool
 def raxml_ng(
         fasta_file, output_dir, temp_dir,
         seq_type, cpus, seed, output_ext):
@@ -19,24 +20,24 @@ def raxml_ng(
         '-T {}'.format(cpus),
         '-p {}'.format(seed),
         '-m {}'.format(model),
-        '-s {}'.format(fasta_file),
+        '-s {}'.format(abspath(fasta_file)),
         '-n {}'.format(tree)])
 
-    with util.cd(temp_dir):
-        subprocess.check_call(cmd, shell=True)
+    yield engine.Command(cmd, cwd=temp_dir)
 
-        tree_src = join('RAxML_bestTree.' + tree)
-        tree_dst = join(output_dir, tree)
-        move(tree_src, tree_dst)
+    tree_src = join(temp_dir, 'RAxML_bestTree.' + tree)
+    tree_dst = join(abspath(output_dir), tree)
+    move(tree_src, tree_dst)
 
     return tree_dst
 
 
+@engine.tool
 def raxml_ng_bs(fasta_file, output_dir, temp_dir,
                 seq_type, cpus, seed, output_ext, replicates=100):
     """Build a bootstrapped tree with raxml."""
     model = "Blosum62" if seq_type == "aa" else "GTR"
-    tree = util.file_name(fasta_file, output_ext, output_dir)
+    tree = util.file_name(fasta_file, output_ext)
     cmd = ' '.join([
         'raxml-ng',
         '-T {}'.format(cpus),
@@ -45,14 +46,13 @@ def raxml_ng_bs(fasta_file, output_dir, temp_dir,
         '-p {}'.format(seed),
         '-m {}'.format(model),
         '-# {}'.format(replicates),
-        '-s {}'.format(fasta_file),
+        '-s {}'.format(abspath(fasta_file)),
         '-n {}'.format(tree)])
 
-    with util.cd(temp_dir):
-        subprocess.check_call(cmd, shell=True)
+    yield engine.Command(cmd, cwd=temp_dir)
 
-        tree_src = join('RAxML_bipartitions.' + tree)
-        tree_dst = join(output_dir, tree)
-        move(tree_src, tree_dst)
+    tree_src = join(temp_dir, 'RAxML_bipartitions.' + tree)
+    tree_dst = join(abspath(output_dir), tree)
+    move(tree_src, tree_dst)
 
     return tree_dst
@@ -1,38 +1,38 @@
 """Convert a Newick tree to a fasta file."""
 
-from Bio import Phylo
 from pylib import bio
+from pylib import newick3
 from pylib import util
 
 
 def tree_to_fasta(old_fasta, tree_file, output_dir, output_ext):
-    """Convert a Newick tree to a fasta file."""
-    tree = Phylo.read(tree_file, 'newick')
+    """Convert a Newick or binary tree to a fasta file."""
+    tree = newick3.parse_from_file(tree_file)
     fasta = bio.read_fasta(old_fasta)
 
-    fasta_path = util.file_name(tree_file, output_ext)
+    fasta_path = util.file_name(tree_file, output_ext, output_dir)
 
     with open(fasta_path, 'w') as out_file:
-        for node in tree.get_terminals():
-            bio.write_fasta_record(out_file, node.name, fasta[node.name])
+        for node in tree.leaves():
+            bio.write_fasta_record(out_file, node.label, fasta[node.label])
 
     return fasta_path
 
 
 def ortholog_to_fasta(old_fasta, tree_file, output_dir, min_taxa, output_ext):
     """Convert a Newick tree to a fasta file using extra checks."""
-    tree = Phylo.read(tree_file, 'newick')
+    tree = newick3.parse_from_file(tree_file)
     fasta = bio.read_fasta(old_fasta)
 
-    fasta_path = util.file_name(tree_file, output_ext)
+    fasta_path = util.file_name(tree_file, output_ext, output_dir)
 
-    taxa = set(n.name.split('@')[0]
-               for n in tree.get_terminals() if '@' in n.name)
+    leaves = tree.leaves()
+    taxa = set(n.label.split('@')[0] for n in leaves if '@' in n.label)
     if len(taxa) < min_taxa:
         return None
 
     with open(fasta_path, 'w') as out_file:
-        for node in tree.get_terminals():
-            bio.write_fasta_record(out_file, node.name, fasta[node.name])
+        for node in leaves:
+            bio.write_fasta_record(out_file, node.label, fasta[node.label])
 
     return fasta_path
@@ -1,38 +1,41 @@
 """Wrapper for the treeshrink program."""
 
+from os.path import abspath, join
 from glob import glob
-from shutil import rmtree
-import subprocess
 from pylib import util
+from pylib import engine
 
 EXT_IN = '.tre'
 EXT_OUT = '.ts'
 
 
+@engine.tool
 def treeshrink(tree_file, output_dir, output_ext, quantiles):
     """Remove long branches from a tree."""
-    subdir = util.file_name(tree_file)
+    tree_file = abspath(tree_file)
+    base_name = util.file_name(tree_file)
 
-    cmd = ' '.join([
-        'run_treeshrink.py',
-        '--tree {}'.format(tree_file),
-        '--centroid',
-        '--mode per-gene',
-        '--quantiles {}'.format(quantiles),
-        '--outdir {}'.format(subdir),
-        '--tempdir {}'.format(subdir)])
+    with util.make_temp_dir(where=output_dir) as temp_dir:
+        subdir = join(temp_dir, base_name)
 
-    with util.cd(output_dir):
-        subprocess.check_call(cmd, shell=True)
+        cmd = ' '.join([
+            'run_treeshrink.py',
+            '--tree {}'.format(tree_file),
+            '--centroid',
+            '--mode per-gene',
+            '--quantiles {}'.format(quantiles),
+            '--outdir {}'.format(subdir),
+            '--tempdir {}'.format(subdir)])
 
-        mask = util.file_name(subdir + '_*', ext=EXT_IN, dir_=subdir)
+        yield engine.Command(cmd, cwd=temp_dir)
+
+        mask = join(subdir, base_name + '_*' + EXT_IN)
         tree_src = glob(mask)[0]
-        tree_dst = util.file_name(tree_file, output_ext + EXT_OUT)
+        tree_dst = util.file_name(
+            tree_file, output_ext + EXT_OUT, abspath(output_dir))
 
         with open(tree_src) as in_file, open(tree_dst, 'w') as out_file:
             content = in_file.read()
             out_file.write(content.replace("'", ''))
 
-        rmtree(subdir)
-
     return tree_dst
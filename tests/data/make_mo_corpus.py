@@ -0,0 +1,62 @@
+"""Write mo_corpus.tre, the trees for the MO pruning tests.
+
+The trees are simulated with a fixed seed so the file can be rebuilt:
+random gene trees and trees where each species has two recent copies,
+all with an out-group clade. Some of them have multifurcations.
+"""
+
+import random
+from os.path import dirname, join
+
+OUT_GROUPS = ['O0', 'O1', 'O2']
+
+
+def join_nodes(nodes, rng, poly=0.0):
+    """Join random subtrees until three are left, three at a time with
+    probability poly, two at a time otherwise."""
+    while len(nodes) > 3:
+        count = 3 if len(nodes) > 4 and rng.random() < poly else 2
+        group = [nodes.pop(rng.randrange(len(nodes))) for _ in range(count)]
+        nodes.append('({}):{:.3f}'.format(','.join(group), rng.random()))
+    return '(' + ','.join(nodes) + ');'
+
+
+def out_group_clade(rng):
+    """One to three out-group tips as a clade."""
+    names = OUT_GROUPS[:rng.randrange(1, 4)]
+    tips = ['{}@o{}:{:.3f}'.format(n, i, rng.random())
+            for i, n in enumerate(names)]
+    if len(tips) == 1:
+        return tips[0]
+    return '({}):0.1'.format(','.join(tips))
+
+
+def random_tree(rng, poly):
+    """A gene tree with random in-group taxa."""
+    taxa = rng.choice([3, 10, 30, 80])
+    tips = ['I{}@g{}:{:.3f}'.format(rng.randrange(taxa), i, rng.random())
+            for i in range(rng.randrange(2, 80))]
+    return join_nodes(tips + [out_group_clade(rng)], rng, poly)
+
+
+def duplicated_tree(rng, poly):
+    """A gene tree where each species has two recent copies."""
+    tips = ['(S{0}@a:{1:.3f},S{0}@b:{2:.3f}):0.1'.format(
+        i, rng.random(), rng.random()) for i in range(rng.randrange(2, 40))]
+    return join_nodes(tips + [out_group_clade(rng)], rng, poly)
+
+
+def main():
+    """Write the corpus."""
+    rng = random.Random(2023)
+    trees = []
+    for i in range(160):
+        poly = 0.05 if i % 5 == 0 else 0.0
+        make = random_tree if i % 2 else duplicated_tree
+        trees.append(make(rng, poly))
+    with open(join(dirname(__file__), 'mo_corpus.tre'), 'w') as out_file:
+        out_file.write('\n'.join(trees) + '\n')
+
+
+if __name__ == '__main__':
+    main()
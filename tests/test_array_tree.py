@@ -0,0 +1,103 @@
+"""Test the array-backed trees against phylo3."""
+
+import math
+import random
+import unittest
+from pylib import newick3
+from pylib.array_tree import ArrayTree
+from pylib.phylo3 import PREORDER, Node, node2size
+
+# Internal labels, a multifurcation, and tips with no length (0, an int)
+TREE = '((A@a1:1.5,(B@b1:2,A@a2:0.25)90:1)x:0.5,C@c1,(B@b2:3)y:1e-3);'
+
+
+def random_tree(rng, tips, taxa):
+    """Join random groups of 1 to 3 subtrees so there are multifurcations
+    and single children. Taxa repeat."""
+    nodes = []
+    for i in range(tips):
+        tip = Node()
+        tip.istip = True
+        tip.label = '{}@t{}'.format(rng.choice(taxa), i)
+        tip.length = rng.choice([rng.random(), 1, None])
+        nodes.append(tip)
+    while len(nodes) > 1:
+        parent = Node()
+        parent.length = rng.choice([rng.random(), 2])
+        for _ in range(min(rng.randint(1, 3), len(nodes))):
+            parent.add_child(nodes.pop(rng.randrange(len(nodes))))
+        nodes.append(parent)
+    return nodes[0]
+
+
+def root_distance(node):
+    """The sum of the branch lengths up to the root, None if one is None."""
+    lengths = [n.length for n in node.rootpath() if n.parent]
+    return None if None in lengths else sum(lengths)
+
+
+def trees():
+    """The fixed tree and some random ones."""
+    rng = random.Random(12)
+    yield newick3.parse(TREE)
+    for tips in [1, 2, 5, 40, 300]:
+        yield random_tree(rng, tips, 'ABCDEFG')
+
+
+def shape(root):
+    """Everything to_node has to give back, in preorder."""
+    return [(n.label, n.length, type(n.length), n.istip, len(n.children))
+            for n in root.iternodes(PREORDER)]
+
+
+class TestArrayTree(unittest.TestCase):
+    """The vectorized passes give the same answers as phylo3."""
+
+    def test_round_trip(self):
+        for i, root in enumerate(trees()):
+            with self.subTest(tree=i):
+                again = ArrayTree.from_node(root).to_node()
+                self.assertEqual(shape(again), shape(root))
+                self.assertTrue(again.isroot)
+
+    def test_clade_sizes(self):
+        for root in trees():
+            nodes = list(root.iternodes(PREORDER))
+            sizes = node2size(root)
+            tree = ArrayTree.from_node(root)
+            self.assertEqual(tree.clade_sizes().tolist(),
+                             [sizes[n] for n in nodes])
+
+    def test_depths_and_root_distances(self):
+        for root in trees():
+            nodes = list(root.iternodes(PREORDER))
+            tree = ArrayTree.from_node(root)
+            self.assertEqual(tree.depth.tolist(),
+                             [len(list(n.rootpath())) - 1 for n in nodes])
+            for node, dist in zip(nodes, tree.root_distances()):
+                want = root_distance(node)
+                if want is None:
+                    self.assertTrue(math.isnan(dist))
+                else:
+                    self.assertAlmostEqual(dist, want)
+
+    def test_taxon_counts(self):
+        for root in trees():
+            nodes = list(root.iternodes(PREORDER))
+            tree = ArrayTree.from_node(root)
+            self.assertEqual(tree.taxon_counts().tolist(),
+                             [n.taxon_count() for n in nodes])
+
+    def test_orders(self):
+        for root in trees():
+            tree = ArrayTree.from_node(root)
+            seen = set()
+            for idx in tree.postorder:
+                if tree.parent[idx] >= 0:
+                    self.assertNotIn(tree.parent[idx], seen)
+                seen.add(idx)
+            self.assertEqual(len(seen), tree.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Test the cache keys for the wrapped programs' outputs."""
+
+import unittest
+from os import makedirs
+from os.path import join
+from tempfile import TemporaryDirectory
+from pylib import cache
+
+
+class TestKey(unittest.TestCase):
+    """The same data and options give the same key wherever they are."""
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        cache.setup(join(self.temp_dir.name, 'cache'))
+        self.addCleanup(cache.setup, None)
+
+    def fasta(self, dir_, seq='ACGT'):
+        """Write a fasta file into a directory under the temp dir."""
+        dir_ = join(self.temp_dir.name, dir_)
+        makedirs(dir_, exist_ok=True)
+        path = join(dir_, 'gene.fasta')
+        with open(path, 'w') as out_file:
+            out_file.write('>a@1\n{}\n'.format(seq))
+        return path
+
+    @staticmethod
+    def key(fasta, output):
+        """A key for a command like the pxclsq wrapper's."""
+        cmd = 'pxclsq --prop 0.1 --seqf {} --outf {}'.format(fasta, output)
+        return cache.key(fasta, cmd, output=output)
+
+    def test_output_dir_is_ignored(self):
+        one, two = self.fasta('one'), self.fasta('two')
+        self.assertEqual(self.key(one, one + '.cln'),
+                         self.key(two, join(self.temp_dir.name, 'x.cln')))
+
+    def test_input_contents_matter(self):
+        one, two = self.fasta('one'), self.fasta('two', seq='TTTT')
+        self.assertNotEqual(self.key(one, one + '.cln'),
+                            self.key(two, two + '.cln'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Test the fa2tree step with stand-ins for the wrapped programs."""
+
+import os
+import sys
+import stat
+import unittest
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+import construct
+from pylib import newick3
+
+
+# The programs are shell scripts. mafft and pxclsq pass the sequences
+# through, raxml always fails, and fasttree fails on an empty alignment
+# and otherwise joins the sequence names into a tree.
+PROGRAMS = {
+    'mafft': """
+        for arg; do last=$arg; done
+        cat "$last"
+        """,
+    'pxclsq': """
+        while [ $# -gt 0 ]; do
+            case $1 in
+                --seqf) seqf=$2; shift;;
+                --outf) outf=$2; shift;;
+            esac
+            shift
+        done
+        cp "$seqf" "$outf"
+        """,
+    'raxml': """
+        exit 1
+        """,
+    'fasttree': """
+        for arg; do last=$arg; done
+        [ -s "$last" ] || exit 1
+        names=$(grep '>' "$last" | sed 's/>//' | paste -sd, -)
+        echo "($names);"
+        """,
+}
+
+FASTA = """>a@1
+ACGTACGTACGT
+>b@2
+ACGTACGAACGT
+>c@3
+ACGAACGAACGT
+>d@4
+ACGAACGAACTT
+"""
+
+
+def make_programs(bin_dir):
+    """Write the stand-in programs."""
+    for name, script in PROGRAMS.items():
+        path = join(bin_dir, name)
+        with open(path, 'w') as out_file:
+            out_file.write('#!/bin/sh\n' + script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+class TestFa2treeRetry(unittest.TestCase):
+    """When raxml fails the last retry builds the tree with fasttree."""
+
+    def test_fasttree_retry_writes_a_tree(self):
+        with TemporaryDirectory() as temp_dir:
+            bin_dir = join(temp_dir, 'bin')
+            output_dir = join(temp_dir, 'out')
+            os.makedirs(bin_dir)
+            os.makedirs(output_dir)
+            make_programs(bin_dir)
+            fasta = join(temp_dir, 'gene.fasta')
+            with open(fasta, 'w') as out_file:
+                out_file.write(FASTA)
+
+            argv = ['construct.py', 'fa2tree', '-i', fasta, '-o', output_dir,
+                    '-t', 'dna', '--retries', '2']
+            path = bin_dir + os.pathsep + os.environ['PATH']
+            with patch.object(sys, 'argv', argv), \
+                    patch.dict(os.environ, {'PATH': path}):
+                args = construct.parse_args()
+                args.func(args)
+
+            tree_file = join(output_dir, 'gene.tre')
+            self.assertTrue(exists(tree_file))
+            tree = newick3.parse_from_file(tree_file)
+            self.assertEqual(
+                sorted(n.label for n in tree.leaves()),
+                ['a@1', 'b@2', 'c@3', 'd@4'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Test splitting the CPUs between jobs and running them."""
+
+import unittest
+from unittest import mock
+from argparse import Namespace
+from pylib import jobs, memory
+
+
+def measure(args, path):
+    """A job that records the memory used by a program it ran."""
+    memory.MEASURED.append(('raxml dna', 1_000, memory.BASE + 500_000))
+    return path
+
+
+class TestSplitCpus(unittest.TestCase):
+    """The jobs can't be more than the CPUs."""
+
+    def test_split(self):
+        self.assertEqual(jobs.split_cpus(64, 16), (16, 4))
+
+    def test_too_many_jobs_warns(self):
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertEqual(jobs.split_cpus(1, 8), (1, 1))
+        self.assertIn('--jobs 8 is more than --cpus 1', logs.output[0])
+
+
+class TestRunSerial(unittest.TestCase):
+    """One job at a time still learns from the memory it measures."""
+
+    def setUp(self):
+        # Learn into a new model so other tests keep the default one
+        for name, value in [('MODEL', memory.Model()), ('MEASURED', [])]:
+            patcher = mock.patch.object(memory, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_measured_memory_is_learned(self):
+        args = Namespace(cpus=1, jobs=1, timeout=None)
+        results = jobs.run_jobs(measure, args, ['a', 'b'])
+        self.assertEqual(results, ['a', 'b'])
+        self.assertEqual(memory.MEASURED, [])
+        self.assertEqual(memory.MODEL.per_cell['raxml dna'], 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
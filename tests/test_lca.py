@@ -0,0 +1,107 @@
+"""Test the LCA index against walking up the tree."""
+
+import random
+import unittest
+from functools import reduce
+from pylib.phylo3 import (
+    PREORDER, Node, getMRCA, getMRCATraverse, LCAIndex)
+
+
+def random_tree(rng, tips, labels):
+    """Join random groups of 1 to 4 subtrees so there are multifurcations
+    and single children. Tip labels repeat."""
+    nodes = []
+    for _ in range(tips):
+        tip = Node()
+        tip.istip = True
+        tip.label = rng.choice(labels)
+        nodes.append(tip)
+    while len(nodes) > 1:
+        parent = Node()
+        for _ in range(min(rng.randint(1, 4), len(nodes))):
+            parent.add_child(nodes.pop(rng.randrange(len(nodes))))
+        nodes.append(parent)
+    return nodes[0]
+
+
+def trees():
+    """Random trees of several sizes with few and with many labels."""
+    rng = random.Random(15)
+    for tips in [1, 2, 3, 10, 60, 400]:
+        for count in [3, tips]:
+            labels = ['S{}@x'.format(i) for i in range(count)]
+            yield rng, random_tree(rng, tips, labels), labels
+
+
+def traverse_mrca(nodes):
+    """The MRCA by walking up from each node in turn."""
+    return reduce(getMRCATraverse, nodes) if nodes else None
+
+
+class TestLCAIndex(unittest.TestCase):
+    """Every query agrees with getMRCATraverse."""
+
+    def test_lca(self):
+        for rng, root, _ in trees():
+            index = LCAIndex(root)
+            nodes = list(root.iternodes(PREORDER))
+            for _ in range(200):
+                node1, node2 = rng.choice(nodes), rng.choice(nodes)
+                self.assertIs(index.lca(node1, node2),
+                              getMRCATraverse(node1, node2))
+
+    def test_mrca_of_labels(self):
+        for rng, root, labels in trees():
+            index = LCAIndex(root)
+            leaves = root.leaves()
+            for _ in range(50):
+                names = rng.sample(labels, rng.randint(1, len(labels)))
+                tips = [t for t in leaves if t.label in names]
+                self.assertIs(index.mrca_of_labels(names),
+                              traverse_mrca(tips))
+
+    def test_get_mrca(self):
+        for rng, root, labels in trees():
+            if len(labels) < 2:
+                continue
+            names = rng.sample(labels, 2)
+            tips = [t for t in root.leaves() if t.label in names]
+            self.assertIs(getMRCA(names, root), traverse_mrca(tips))
+            self.assertIsNone(getMRCA(names[:1], root))
+
+
+class TestCachedIndex(unittest.TestCase):
+    """The index is kept until the tree is edited."""
+
+    def test_kept(self):
+        _, root, _ = list(trees())[-1]
+        self.assertIs(root.lca_index(), root.lca_index())
+
+    def test_cleared_by_edits(self):
+        for edit in ['add', 'remove', 'replace']:
+            with self.subTest(edit=edit):
+                _, root, labels = list(trees())[-1]
+                index = root.lca_index()
+                node = root
+                while not node.istip:
+                    node = node.children[-1]
+                parent = node.parent
+                new_tip = Node()
+                new_tip.istip = True
+                new_tip.label = 'new@x'
+                if edit == 'add':
+                    parent.add_child(new_tip)
+                elif edit == 'remove':
+                    parent.remove_child(node)
+                else:
+                    parent.replace_child(node, new_tip)
+
+                self.assertIsNot(root.lca_index(), index)
+                tips = [t for t in root.leaves()
+                        if t.label in ('new@x', labels[0])]
+                self.assertIs(getMRCA(['new@x', labels[0]], root),
+                              traverse_mrca(tips))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Test skipping work that is already done."""
+
+import unittest
+from os.path import join
+from argparse import Namespace
+from tempfile import TemporaryDirectory
+from pylib.manifest import resumable
+
+CALLS = []
+
+
+@resumable('test', params=('min_taxa',), files=('code_file',))
+def step(args, path):
+    """Record every time the step really runs."""
+    CALLS.append(path)
+
+
+class TestResumable(unittest.TestCase):
+    """A step is redone when the contents of a file argument change."""
+
+    def test_file_contents_are_checked(self):
+        CALLS.clear()
+        with TemporaryDirectory() as temp_dir:
+            path = join(temp_dir, 'gene.tre')
+            code_file = join(temp_dir, 'codes.txt')
+            for name, text in [(path, '(a,b);\n'), (code_file, 'IN a\n')]:
+                with open(name, 'w') as out_file:
+                    out_file.write(text)
+            args = Namespace(
+                output_dir=temp_dir, min_taxa=4, code_file=code_file)
+
+            step(args, path)
+            step(args, path)
+            self.assertEqual(len(CALLS), 1)
+
+            with open(code_file, 'w') as out_file:
+                out_file.write('IN b\n')
+            step(args, path)
+            self.assertEqual(len(CALLS), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Test matching ortholog trees to their fasta files."""
+
+import unittest
+from os.path import join
+from argparse import Namespace
+from tempfile import TemporaryDirectory
+from pylib.steps.orth2fa import gene_stem, orth2fa
+
+
+class TestGeneStem(unittest.TestCase):
+    """Get the gene's name from the file names."""
+
+    def test_pruner_outputs(self):
+        for tree in ['dir/gene1.ortho.tre', 'gene1.ortho2.tre',
+                     'gene1_MIortho3.tre', 'gene1_1to1ortho.tre',
+                     'gene1.tree2.ortho.tre']:
+            self.assertEqual(gene_stem(tree), 'gene1', tree)
+
+    def test_mo_output(self):
+        self.assertEqual(gene_stem('out/gene1.ortho.tre'), 'gene1')
+
+    def test_rt_outputs(self):
+        self.assertEqual(gene_stem('out/gene1.ortho12.tre'), 'gene1')
+        self.assertEqual(gene_stem('out/gene1.unrooted-ortho.tre'), 'gene1')
+
+    def test_mi_outputs(self):
+        self.assertEqual(gene_stem('out/gene1_MIortho2.tre'), 'gene1')
+        self.assertEqual(gene_stem('out/gene1_1to1ortho.tre'), 'gene1')
+
+    def test_1to1_output(self):
+        self.assertEqual(gene_stem('out/gene1.tree3_1to1ortho.tre'),
+                         'gene1')
+
+    def test_fasta(self):
+        self.assertEqual(gene_stem('data/gene1.fasta'), 'gene1')
+
+
+class TestOrth2fa(unittest.TestCase):
+    """Each tree gets the sequences from its own gene's fasta file."""
+
+    def test_trees_are_matched_by_gene(self):
+        with TemporaryDirectory() as temp_dir:
+            fastas, trees = [], []
+            for gene, taxa in [('g1', 'ABC'), ('g2', 'DEF')]:
+                fasta = join(temp_dir, gene + '.fasta')
+                with open(fasta, 'w') as out_file:
+                    for taxon in taxa:
+                        out_file.write('>{}@{}\nACGT\n'.format(taxon, gene))
+                fastas.append(fasta)
+                for i in (1, 2):
+                    tree = join(temp_dir, '{}.ortho{}.tre'.format(gene, i))
+                    with open(tree, 'w') as out_file:
+                        out_file.write(
+                            '({0}@{3}:1,{1}@{3}:1,{2}@{3}:1);\n'.format(
+                                *taxa, gene))
+                    trees.append(tree)
+
+            args = Namespace(
+                tree_files=trees, fasta_files=fastas[::-1],
+                output_dir=temp_dir, output_ext='.fa', min_taxa=2,
+                force=False)
+            orth2fa(args)
+
+            with open(join(temp_dir, 'g2.ortho2.fa')) as in_file:
+                self.assertIn('>D@g2', in_file.read())
+
+    def test_missing_fasta(self):
+        args = Namespace(
+            tree_files=['g3.ortho.tre'], fasta_files=['g1.fasta'],
+            output_dir='.', output_ext='.fa', min_taxa=2, force=False)
+        with self.assertRaises(SystemExit):
+            orth2fa(args)
+
+
+if __name__ == '__main__':
+    unittest.main()
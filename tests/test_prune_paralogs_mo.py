@@ -0,0 +1,162 @@
+"""Test MO paralog pruning on a corpus of trees, see data/mo_corpus.tre."""
+
+import unittest
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+from pylib import newick3, phylo3
+from pylib.wrappers import prune_paralogs_mo as mo
+
+CORPUS = join(dirname(__file__), 'data', 'mo_corpus.tre')
+OUT_GROUPS = ['O0', 'O1', 'O2']
+
+# The in-group clade's first two children share no taxa, so neither way
+# of cutting can remove the second A
+STUCK = '(O0@o1:1,(A@a1:1,B@b1:1,A@a2:1):1,C@c1:1);'
+
+
+# The cutting as it was before the single pass, with name sets and a
+# restart from the root after every cut. It is copied here so the test
+# does not share the taxon mask code that it checks.
+
+def get_front_names(node):
+    return [leaf.label.split('@')[0] for leaf in node.leaves()]
+
+
+def get_front_outgroup_names(node, out_groups):
+    return [i for i in get_front_names(node) if i in out_groups]
+
+
+def remove_kink(node, cur_root):
+    if node == cur_root and cur_root.nchildren == 2:
+        # move the root away to an adjacent none-tip
+        if cur_root.children[0].istip:  # the other child is not tip
+            cur_root = phylo3.reroot(cur_root, cur_root.children[1])
+        else:
+            cur_root = phylo3.reroot(cur_root, cur_root.children[0])
+    # ---node---< all nodes should have one child only now
+    length = node.length + (node.children[0]).length
+    par = node.parent
+    kink = node
+    node = node.children[0]
+    # parent--kink---node<
+    par.remove_child(kink)
+    par.add_child(node)
+    node.length = length
+    return node, cur_root
+
+
+def cut_root_clade(root, node_a, node_b):
+    name_set_a = set(get_front_names(node_a))
+    name_set_b = set(get_front_names(node_b))
+    if len(name_set_a.intersection(name_set_b)) > 0:
+        if len(name_set_a) > len(name_set_b):  # cut the side with less taxa
+            root.remove_child(node_b)
+            node_b.prune()
+        else:
+            root.remove_child(node_a)
+            node_a.prune()
+
+
+def cut_and_restart(root, out_groups):
+    """The old prune_paralogs_from_rerooted_homotree.
+
+    The old loop never ended when it found nothing left to cut but there
+    were still duplicates. Here it stops.
+    """
+    if len(get_front_names(root)) == len(set(get_front_names(root))):
+        return root  # no pruning needed
+    # one or two of the trifurcating root clades are in-group clades
+    node0, node1, node2 = root.children[0], root.children[1], root.children[2]
+    out0 = len(get_front_outgroup_names(node0, out_groups))
+    out1 = len(get_front_outgroup_names(node1, out_groups))
+    out2 = len(get_front_outgroup_names(node2, out_groups))
+    if out0 == 0 and out1 == 0:  # 0 and 1 are the in-group clades
+        cut_root_clade(root, node0, node1)
+    elif out1 == 0 and out2 == 0:  # 1 and 2 are the in-group clades
+        cut_root_clade(root, node1, node2)
+    elif out0 == 0 and out2 == 0:  # 0 and 2 are the in-group clades
+        cut_root_clade(root, node0, node2)
+    while len(get_front_names(root)) > len(set(get_front_names(root))):
+        for node in root.iternodes(order=phylo3.PREORDER):
+            if node.istip or node == root:
+                continue
+            child0, child1 = node.children[0], node.children[1]
+            name_set0 = set(get_front_names(child0))
+            name_set1 = set(get_front_names(child1))
+            if len(name_set0.intersection(name_set1)) > 0:
+                if len(name_set0) > len(name_set1):  # cut side w/ fewer taxa
+                    node.remove_child(child1)
+                    child1.prune()
+                else:
+                    node.remove_child(child0)
+                    child0.prune()
+                node, root = remove_kink(node, root)  # no rerooting here
+                break
+        else:
+            break
+    return root
+
+
+def rerooted_corpus():
+    """The corpus trees that can be rerooted on their out-groups."""
+    for tree in newick3.trees_from_file(CORPUS):
+        root = mo.reroot_with_monophyletic_outgroups(tree, OUT_GROUPS)
+        if root is not None:
+            yield root
+
+
+class TestPruneParalogsFromRerootedHomotree(unittest.TestCase):
+    """The single pass must cut the same as restarting after every cut."""
+
+    def test_same_as_restarting(self):
+        count = 0
+        for single, restart in zip(rerooted_corpus(), rerooted_corpus()):
+            single = mo.prune_paralogs_from_rerooted_homotree(
+                single, OUT_GROUPS)
+
+            restart = cut_and_restart(restart, OUT_GROUPS)
+
+            self.assertEqual(
+                newick3.to_string(single), newick3.to_string(restart))
+            count += 1
+        self.assertGreater(count, 100)
+
+    def test_no_duplicates_are_written(self):
+        with TemporaryDirectory() as temp_dir:
+            with self.assertLogs(level='INFO'):
+                outputs = mo.prune_mo(CORPUS, temp_dir, 2, OUT_GROUPS)
+
+            orthologs = [o for o in outputs if o.endswith('.ortho.tre')]
+            self.assertTrue(orthologs)
+            for ortholog in orthologs:
+                with self.subTest(ortholog=ortholog):
+                    tree = newick3.parse_from_file(ortholog)
+                    self.assertFalse(tree.has_duplicates())
+
+    def test_corpus_has_trees_that_cannot_be_cut(self):
+        stuck = [r for r in rerooted_corpus()
+                 if mo.prune_paralogs_from_rerooted_homotree(
+                     r, OUT_GROUPS).has_duplicates()]
+        self.assertTrue(stuck)
+
+
+    def test_tree_left_with_duplicates_is_skipped(self):
+        """The old code never returned on such a tree. Now the tree is
+        reported and gets no ortholog file."""
+        stuck = cut_and_restart(newick3.parse(STUCK), OUT_GROUPS)
+        self.assertTrue(stuck.has_duplicates())
+
+        with TemporaryDirectory() as temp_dir:
+            tree = join(temp_dir, 'gene.tre')
+            with open(tree, 'w') as out_file:
+                out_file.write(STUCK)
+            with self.assertLogs(level='WARNING') as logs:
+                outputs = mo.prune_mo(tree, temp_dir, 2, OUT_GROUPS)
+
+        self.assertEqual(outputs, [join(temp_dir, 'gene.reroot')])
+        self.assertEqual(logs.output,
+                         ['WARNING:root:duplicated taxa left after pruning'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Test RT paralog pruning."""
+
+import unittest
+from os.path import join
+from tempfile import TemporaryDirectory
+from pylib.wrappers.prune_paralogs_rt import prune_rt
+
+CODES = 'IN\tA\nIN\tB\nIN\tC\nOUT\tO\nOUT\tP\n'
+
+# The out-groups split the in-group taxa into two in-group clades
+TWO_INCLADES = """(((A@a1:1,B@b1:1):1,C@c1:1):1,O@o1:1,
+    ((A@a2:1,B@b2:1):1,(C@c2:1,P@p1:1):1):1);"""
+
+
+class TestPruneRt(unittest.TestCase):
+    """Each in-group clade's orthologs get their own files."""
+
+    def test_orthologs_from_two_inclades(self):
+        with TemporaryDirectory() as temp_dir:
+            tree = join(temp_dir, 'gene.mm')
+            code_file = join(temp_dir, 'codes.txt')
+            for path, text in [(tree, TWO_INCLADES), (code_file, CODES)]:
+                with open(path, 'w') as out_file:
+                    out_file.write(text)
+
+            with self.assertLogs(level='INFO'):
+                outputs = prune_rt(tree, temp_dir, 2, code_file)
+
+            orthologs = [o for o in outputs if 'ortho' in o]
+            self.assertEqual(orthologs, [join(temp_dir, 'gene.ortho1.tre'),
+                                         join(temp_dir, 'gene.ortho2.tre')])
+            with open(orthologs[0]) as ortho1, open(orthologs[1]) as ortho2:
+                self.assertNotEqual(ortho1.read(), ortho2.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
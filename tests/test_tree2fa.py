@@ -0,0 +1,46 @@
+"""Test matching trees to their fasta files in tree2fa."""
+
+import unittest
+from os.path import join
+from argparse import Namespace
+from tempfile import TemporaryDirectory
+from pylib.steps.tree2fa import tree2fa
+
+
+class TestTree2fa(unittest.TestCase):
+    """Each tree gets the sequences from its own gene's fasta file."""
+
+    def write(self, temp_dir, name, text):
+        """Write a file into the temp dir and return its path."""
+        path = join(temp_dir, name)
+        with open(path, 'w') as out_file:
+            out_file.write(text)
+        return path
+
+    def test_trees_are_matched_by_gene(self):
+        with TemporaryDirectory() as temp_dir:
+            fastas = [
+                self.write(temp_dir, 'g1.fasta', '>A@1\nAAAA\n>B@1\nCCCC\n'),
+                self.write(temp_dir, 'g2.fasta', '>C@2\nGGGG\n>D@2\nTTTT\n'),
+                self.write(temp_dir, 'g3.fasta', '>E@3\nACGT\n')]
+            trees = [self.write(temp_dir, 'g2.mm', '(C@2:1,D@2:1);\n')]
+
+            args = Namespace(
+                tree_files=trees, mask_files=fastas, output_dir=temp_dir,
+                output_ext='.fa', force=False)
+            tree2fa(args)
+
+            with open(join(temp_dir, 'g2.fa')) as in_file:
+                self.assertEqual(in_file.read().split(), [
+                    '>C@2', 'GGGG', '>D@2', 'TTTT'])
+
+    def test_missing_fasta(self):
+        args = Namespace(
+            tree_files=['g1.mm', 'g2.mm'], mask_files=['g2.fasta'],
+            output_dir='.', output_ext='.fa', force=False)
+        with self.assertRaises(SystemExit):
+            tree2fa(args)
+
+
+if __name__ == '__main__':
+    unittest.main()